@@ -0,0 +1,285 @@
+# api_server.py
+# Headless HTTP API around the clarify / process_user_query stages of services.py.
+#
+#   POST /clarify  {"query": ...}                                      -> {"clarification": ...}
+#   POST /query    {"query": ..., "clarification_prompt": ...,
+#                   "clarification_response": ...}                     -> {"text", "columns", "rows"}
+#                  (or an Arrow IPC stream of the table with Accept: application/vnd.apache.arrow.stream)
+#                  the response also carries the generated "sql" (X-Generated-SQL header for Arrow)
+#   POST /export   {"sql": ..., "format": "csv" | "parquet" | "arrow"}  -> the full result, streamed batch by batch
+#   GET  /health                                                       -> {"status": "ok", ...}
+#   GET  /metrics                                                      -> request counters and latencies
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+from aiohttp import web
+
+from llm.example_store import get_retrieval_stats
+from llm.llm_scheduler import get_scheduler
+from result_export import EXPORT_FORMATS, EXPORT_TIMEOUT_S, ExportError, stream_export, validate_select_sql
+from services import clarify, process_user_query_with_sql
+from startup import warm_up
+
+ARROW_STREAM_MIME = "application/vnd.apache.arrow.stream"
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_REQUEST_TIMEOUT_S = 120.0
+DEFAULT_MAX_EXPORTS = 2
+# Metrics bucket of the requests that match no route (unknown paths, wrong methods).
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Metrics:
+    """
+    In-process request counters and latencies per endpoint.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.waiting = 0
+        self.endpoints: dict[str, dict] = {}
+
+    def record(self, endpoint: str, status: int, elapsed_s: float) -> None:
+        stats = self.endpoints.setdefault(endpoint, {
+            "requests": 0, "errors": 0, "timeouts": 0, "total_s": 0.0, "max_s": 0.0,
+        })
+        stats["requests"] += 1
+        stats["total_s"] += elapsed_s
+        stats["max_s"] = max(stats["max_s"], elapsed_s)
+        if status == 504:
+            stats["timeouts"] += 1
+        elif status >= 400:
+            stats["errors"] += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_s": time.time() - self.started_at,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "endpoints": {
+                name: {**stats, "mean_s": stats["total_s"] / stats["requests"] if stats["requests"] else 0.0}
+                for name, stats in self.endpoints.items()
+            },
+        }
+
+
+def dataframe_to_json(df: pd.DataFrame | None) -> dict:
+    if df is None:
+        return {"columns": None, "rows": []}
+    return {"columns": list(df.columns), "rows": json.loads(df.to_json(orient="values", date_format="iso"))}
+
+
+def dataframe_to_arrow_stream(df: pd.DataFrame | None) -> bytes:
+    table = pa.Table.from_pandas(df if df is not None else pd.DataFrame(), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+async def run_stage(request: web.Request, func, *args):
+    """
+    Runs a blocking services function in the worker pool, under the concurrency limit
+    and the request timeout. Raises web.HTTPGatewayTimeout on timeout and
+    web.HTTPBadGateway (with a JSON error) if the function raised.
+    """
+    app = request.app
+    metrics: Metrics = app["metrics"]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + app["request_timeout_s"]
+
+    metrics.waiting += 1
+    try:
+        await asyncio.wait_for(app["semaphore"].acquire(), timeout=app["request_timeout_s"])
+    except asyncio.TimeoutError:
+        raise web.HTTPGatewayTimeout(text=json.dumps({"error": "Timed out waiting for a free worker."}),
+                                     content_type="application/json")
+    finally:
+        metrics.waiting -= 1
+
+    metrics.in_flight += 1
+    try:
+        # The worker thread cannot be cancelled: on timeout the call finishes in the
+        # background and its slot is released only then.
+        future = loop.run_in_executor(app["executor"], func, *args)
+        future.add_done_callback(lambda _: app["semaphore"].release())
+        return await asyncio.wait_for(asyncio.shield(future), timeout=max(0.0, deadline - loop.time()))
+    except asyncio.TimeoutError:
+        raise web.HTTPGatewayTimeout(text=json.dumps({"error": "Request timed out."}),
+                                     content_type="application/json")
+    except sqlite3.Error as e:
+        # The generated SQL failed on the database: the client gets the database error
+        raise web.HTTPBadGateway(text=json.dumps({"error": "The generated SQL query failed.", "detail": str(e)}),
+                                 content_type="application/json")
+    except Exception as e:
+        print(f"{getattr(func, '__name__', func)} failed: {e}")
+        raise web.HTTPBadGateway(text=json.dumps({"error": f"The request could not be processed ({type(e).__name__})."}),
+                                 content_type="application/json")
+    finally:
+        metrics.in_flight -= 1
+
+
+async def read_json(request: web.Request, *required: str) -> dict:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Body must be JSON."}), content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({"error": "Body must be a JSON object."}),
+                                 content_type="application/json")
+    missing = [key for key in required if not isinstance(body.get(key), str)]
+    if missing:
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"Missing string fields: {', '.join(missing)}"}),
+                                 content_type="application/json")
+    return body
+
+
+async def handle_clarify(request: web.Request) -> web.Response:
+    body = await read_json(request, "query")
+    clarification = await run_stage(request, clarify, body["query"])
+    return web.json_response({"clarification": clarification})
+
+
+async def handle_query(request: web.Request) -> web.Response:
+    body = await read_json(request, "query", "clarification_prompt", "clarification_response")
+    text, table, sql = await run_stage(
+        request, process_user_query_with_sql, body["query"], body["clarification_prompt"], body["clarification_response"]
+    )
+    if ARROW_STREAM_MIME in request.headers.get("Accept", ""):
+        # The summary text travels in a header so the body stays a plain Arrow stream
+        return web.Response(body=dataframe_to_arrow_stream(table), content_type=ARROW_STREAM_MIME,
+                            headers={"X-Response-Text": json.dumps(text), "X-Generated-SQL": json.dumps(sql)})
+    return web.json_response({"text": text, "sql": sql, **dataframe_to_json(table)})
+
+
+async def handle_export(request: web.Request) -> web.StreamResponse:
+    body = await read_json(request, "sql", "format")
+    if body["format"] not in EXPORT_FORMATS:
+        raise web.HTTPBadRequest(text=json.dumps({"error": f"Unknown format, expected one of {', '.join(EXPORT_FORMATS)}."}),
+                                 content_type="application/json")
+    try:
+        validate_select_sql(body["sql"])
+    except ExportError as e:
+        raise web.HTTPBadRequest(text=json.dumps({"error": str(e)}), content_type="application/json")
+
+    app = request.app
+    try:
+        await asyncio.wait_for(app["export_semaphore"].acquire(), timeout=app["request_timeout_s"])
+    except asyncio.TimeoutError:
+        raise web.HTTPGatewayTimeout(text=json.dumps({"error": "Timed out waiting for a free export slot."}),
+                                     content_type="application/json")
+
+    extension, mime = EXPORT_FORMATS[body["format"]]
+    loop = asyncio.get_running_loop()
+    executor = app["export_executor"]
+    chunks = stream_export(body["sql"], body["format"], timeout_s=app["export_timeout_s"])
+    response = web.StreamResponse(headers={
+        "Content-Type": mime, "Content-Disposition": f'attachment; filename="result.{extension}"',
+    })
+    # Each batch is read and encoded in the export pool and written before the next one is
+    # read, so memory stays bounded by one batch whatever the result size. Exports have
+    # their own slots and workers, so they never hold up /clarify and /query, and SQLite
+    # stops the query once export_timeout_s has passed, slow clients included (the
+    # connection is then dropped, so a truncated export is not mistaken for a complete one).
+    try:
+        try:
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+        except (ExportError, sqlite3.Error) as e:
+            raise web.HTTPBadRequest(text=json.dumps({"error": str(e)}), content_type="application/json")
+        await response.prepare(request)
+        while chunk is not None:
+            await response.write(chunk)
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+    finally:
+        await loop.run_in_executor(executor, chunks.close)
+        app["export_semaphore"].release()
+    await response.write_eof()
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok", "in_flight": request.app["metrics"].in_flight})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.json_response({
+        **request.app["metrics"].snapshot(),
+        "llm_scheduler": get_scheduler().stats(),
+        "few_shot_examples": get_retrieval_stats().snapshot(),
+    })
+
+
+def route_name(request: web.Request) -> str:
+    """
+    The route a request matched, so that metrics stay bounded whatever paths clients send.
+    """
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else UNMATCHED_ROUTE
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        request.app["metrics"].record(route_name(request), status, time.perf_counter() - start)
+
+
+def create_app(max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+               request_timeout_s: float = DEFAULT_REQUEST_TIMEOUT_S,
+               max_exports: int = DEFAULT_MAX_EXPORTS,
+               export_timeout_s: float = EXPORT_TIMEOUT_S) -> web.Application:
+    app = web.Application(middlewares=[metrics_middleware])
+    app["metrics"] = Metrics()
+    app["request_timeout_s"] = request_timeout_s
+    app["export_timeout_s"] = export_timeout_s
+    app["executor"] = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="services")
+    app["export_executor"] = ThreadPoolExecutor(max_workers=max_exports, thread_name_prefix="export")
+
+    async def on_startup(app):
+        app["semaphore"] = asyncio.Semaphore(max_concurrency)
+        app["export_semaphore"] = asyncio.Semaphore(max_exports)
+        await asyncio.get_running_loop().run_in_executor(app["executor"], warm_up)
+
+    async def on_cleanup(app):
+        app["executor"].shutdown(wait=False, cancel_futures=True)
+        app["export_executor"].shutdown(wait=False, cancel_futures=True)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/clarify", handle_clarify)
+    app.router.add_post("/query", handle_query)
+    app.router.add_post("/export", handle_export)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the AskMyChambre HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT_S, help="request timeout in seconds")
+    parser.add_argument("--max-exports", type=int, default=DEFAULT_MAX_EXPORTS, help="concurrent /export requests")
+    parser.add_argument("--export-timeout", type=float, default=EXPORT_TIMEOUT_S, help="export time limit in seconds")
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.max_concurrency, args.timeout, args.max_exports, args.export_timeout),
+                host=args.host, port=args.port)
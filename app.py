@@ -1,11 +1,20 @@
 # app.py (Refactored for immediate UI update)
 
+import os
+import sqlite3
+import tempfile
+import uuid
+
 import streamlit as st
 import pandas as pd
 from PIL import Image
 
 # Import service functions that now handle DB interactions internally
-from services import clarify, process_user_query
+from services import clarify, process_user_query_with_sql, process_follow_up_query
+from result_export import EXPORT_FORMATS, EXPORT_TIMEOUT_S, ExportError, export_to_file
+from llm.llm_scheduler import LLMSchedulerError
+from result_store import ResultStore, make_history_result
+from startup import warm_up
 
 # ---------- Page layout & Logo Setup ----------
 try:
@@ -28,10 +37,22 @@ st.title("AskMyChambre")
 st.caption("SEMANTIC SEARCH FOR PARLIAMENTARY DATA IN LUXEMBOURG")
 st.markdown("---")
 
+@st.cache_resource # One result store shared by all sessions of the process
+def get_result_store() -> ResultStore:
+    return ResultStore()
+
+result_store = get_result_store()
+
+# Heavy imports, LLM client, DB connection and schema catalog are loaded once per
+# process here instead of on the first user request (no-op on later reruns)
+warm_up()
+
 # ---------- Session state initialization ----------
 # We add new stages: 'clarifying' and 'processing'
 if "stage" not in st.session_state:
     st.session_state.stage = "query1"
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "initial_query" not in st.session_state:
@@ -41,14 +62,68 @@ if "clarification_prompt" not in st.session_state:
 # Add a state to hold the user's response to the clarification
 if "clarification_response" not in st.session_state:
     st.session_state.clarification_response = ""
+# Follow-up questions are answered over the last result, kept in the result store
+if "follow_up_query" not in st.session_state:
+    st.session_state.follow_up_query = ""
+if "last_result_id" not in st.session_state:
+    st.session_state.last_result_id = None
 
 
 # ---------- Render chat history (runs on every script execution) ----------
+# History entries only hold a small preview of each result; the full table is
+# loaded from the result store when the user asks for it.
+def render_result(result: dict) -> None:
+    if result["rows"] == 0:
+        return
+    if result["rows"] <= len(result["preview"]):
+        st.dataframe(result["preview"])
+        return
+    if result["id"] and st.toggle(f"Show all {result['rows']} rows", key=f"show_{result['id']}"):
+        full_table = result_store.get(result["id"])
+        if full_table is not None:
+            st.dataframe(full_table)
+            return
+        st.info("The full table of this answer is no longer available, showing a preview.")
+    st.dataframe(result["preview"])
+    st.caption(f"Preview of {len(result['preview'])} out of {result['rows']} rows.")
+
+# Downloads re-run the SQL of the answer and stream it batch by batch into a temporary
+# file. st.download_button still reads that whole file into Streamlit's in-memory media
+# storage, so the UI is meant for results of a reasonable size; large results should go
+# through the streamed /export endpoint of api_server or the result_export CLI.
+# The file is handed to the download button of this run only and removed right away, so
+# later reruns do not carry prepared exports around.
+def render_export(result: dict) -> None:
+    if not result.get("sql") or result["rows"] == 0:
+        return
+    columns = st.columns([1, 1, 2])
+    export_format = columns[0].selectbox(
+        "Format", list(EXPORT_FORMATS), key=f"export_format_{result['id']}", label_visibility="collapsed"
+    )
+    if not columns[1].button("Prepare download", key=f"prepare_{result['id']}_{export_format}"):
+        return
+    extension, mime = EXPORT_FORMATS[export_format]
+    with tempfile.NamedTemporaryFile(suffix=f".{extension}", delete=False) as f:
+        path = f.name
+    try:
+        export_to_file(result["sql"], export_format, path, timeout_s=EXPORT_TIMEOUT_S)
+        with open(path, "rb") as f:
+            columns[2].download_button(
+                f"Download {extension.upper()}", f, file_name=f"result.{extension}", mime=mime,
+                key=f"download_{result['id']}_{export_format}",
+            )
+        columns[2].caption("For very large results, use the /export API or result_export.py, which stream the file.")
+    except (ExportError, sqlite3.Error) as e:
+        st.error(f"This result cannot be exported: {e}")
+    finally:
+        os.remove(path)
+
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
-        if "table" in msg and msg.get("table") is not None and not msg["table"].empty:
-            st.dataframe(msg["table"])
+        if msg.get("result") is not None:
+            render_result(msg["result"])
+            render_export(msg["result"])
 
 # ---------- Main Interaction Logic (The "State Machine") ----------
 
@@ -77,18 +152,35 @@ if st.session_state.stage == "processing":
     with st.chat_message("assistant"):
         with st.spinner("Processing your request... ⚙️"):
             try:
-                response_text, response_df = process_user_query(
+                response_text, response_df, generated_sql = process_user_query_with_sql(
                     st.session_state.initial_query,
                     st.session_state.clarification_prompt,
                     st.session_state.clarification_response, # Use the saved response
                 )
+                result = make_history_result(result_store, st.session_state.session_id, response_df)
+                if result:
+                    result["sql"] = generated_sql # Lets the full result be exported from the database
                 st.session_state.messages.append({
                     "role": "assistant",
                     "content": response_text,
-                    "table": response_df,
+                    "result": result,
                 })
+                st.session_state.last_result_id = result["id"] if result else None
                 st.session_state.stage = "done" # Final stage
                 st.rerun()
+            except LLMSchedulerError as e:
+                print(f"SQL generation failed: {e}")
+                error_message = "The language model is not available right now. Please try again in a moment."
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I encountered an error. {error_message}"})
+                st.session_state.stage = "query2" # Go back to allow re-trying the clarification
+            except sqlite3.Error as e:
+                print(f"The generated SQL query failed: {e}")
+                error_message = ("The query generated for your request could not be run on the database. "
+                                 "Please rephrase it or add details.")
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": f"Sorry, I encountered an error. {error_message}"})
+                st.session_state.stage = "query2" # Go back to allow re-trying the clarification
             except Exception as e:
                 error_message = f"An error occurred while processing your query: {e}"
                 st.error(error_message)
@@ -96,6 +188,39 @@ if st.session_state.stage == "processing":
                 st.session_state.stage = "query2" # Go back to allow re-trying the clarification
 
 
+# Stage to answer a follow-up question over the previous result.
+# Falls back to the full pipeline (without a new clarification) when the previous result is not enough.
+if st.session_state.stage == "following_up":
+    with st.chat_message("assistant"):
+        with st.spinner("Refining the previous result..."):
+            follow_up = None
+            previous_result = result_store.get_arrow(st.session_state.last_result_id) if st.session_state.last_result_id else None
+            if previous_result is not None:
+                try:
+                    follow_up = process_follow_up_query(
+                        st.session_state.follow_up_query,
+                        st.session_state.initial_query,
+                        previous_result,
+                    )
+                except Exception as e:
+                    print(f"Follow-up failed, falling back to the full pipeline: {e}")
+
+            if follow_up is not None:
+                response_text, response_df = follow_up
+                result = make_history_result(result_store, st.session_state.session_id, response_df)
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": response_text,
+                    "result": result,
+                })
+                st.session_state.last_result_id = result["id"]
+                st.session_state.stage = "done"
+            else:
+                st.session_state.clarification_response += f"\nFollow-up request: {st.session_state.follow_up_query}"
+                st.session_state.stage = "processing"
+            st.rerun()
+
+
 # --- Part 2: Handle the user's direct input ---
 # This block's only job is to capture input, update the state, and trigger a rerun.
 
@@ -103,12 +228,12 @@ user_prompt_text = "What can I help you with?"
 if st.session_state.stage == "query2":
     user_prompt_text = "Please provide more details or refine your query."
 elif st.session_state.stage == "done":
-    user_prompt_text = "Type here to start a new search, or use the button below."
+    user_prompt_text = "Ask a follow-up about this result, or use the button below to start a new search."
 
 # Disable input while processing
-is_processing = st.session_state.stage in ["clarifying", "processing"]
+is_processing = st.session_state.stage in ["clarifying", "processing", "following_up"]
 
-if user_input := st.chat_input(user_prompt_text, disabled=(is_processing or st.session_state.stage == "done")):
+if user_input := st.chat_input(user_prompt_text, disabled=is_processing):
 
     if st.session_state.stage == "query1":
         # 1. Immediately add user message to state
@@ -128,10 +253,17 @@ if user_input := st.chat_input(user_prompt_text, disabled=(is_processing or st.s
         # 3. Rerun to show the message and trigger the 'processing' block
         st.rerun()
 
+    elif st.session_state.stage == "done":
+        st.session_state.messages.append({"role": "user", "content": user_input})
+        st.session_state.follow_up_query = user_input
+        st.session_state.stage = "following_up"
+        st.rerun()
+
 # ---------- Reset / New Search Button ----------
 if st.session_state.stage == "done":
     st.markdown("---")
     if st.button("🔄 Start a New Search", type="primary", use_container_width=True):
+        result_store.drop_session(st.session_state.session_id)
         # A more robust way to clear state
         for key in list(st.session_state.keys()):
             del st.session_state[key]
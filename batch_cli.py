@@ -0,0 +1,126 @@
+# batch_cli.py
+# Processes a file of questions through the services pipeline without the Streamlit UI.
+#
+# Input: one JSON object per line
+#   {"id": "q1", "query": "...", "clarification_response": "...", "clarification_prompt": "..."}
+# "clarification_prompt" is optional: when missing, it is generated with clarify() first.
+# Output: one JSON object per line with the generated SQL, the summary text, the result
+# size and any error; result tables are optionally written as CSV files.
+
+from __future__ import annotations
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services import clarify, generate_sql_for_query, run_generated_sql, summarize_query_result
+from startup import warm_up
+
+DEFAULT_LLM_PARALLELISM = 4
+DEFAULT_DB_PARALLELISM = 2
+
+
+def read_questions(path: str) -> list[dict]:
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            question = json.loads(line)
+            question.setdefault("id", str(line_number))
+            question.setdefault("clarification_response", "")
+            questions.append(question)
+    return questions
+
+
+class BatchRunner:
+    """
+    Runs questions concurrently with separate limits on LLM calls and database queries,
+    so slow model calls do not starve the database and the other way round.
+    """
+
+    def __init__(self, llm_parallelism: int, db_parallelism: int, tables_dir: str | None = None):
+        self.executor = ThreadPoolExecutor(max_workers=llm_parallelism + db_parallelism)
+        self.llm_slots = asyncio.Semaphore(llm_parallelism)
+        self.db_slots = asyncio.Semaphore(db_parallelism)
+        self.tables_dir = tables_dir
+
+    async def _run(self, slots: asyncio.Semaphore, func, *args):
+        async with slots:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def process(self, question: dict) -> dict:
+        start = time.perf_counter()
+        result = {"id": question["id"], "query": question["query"]}
+        try:
+            clarification_prompt = question.get("clarification_prompt")
+            if clarification_prompt is None:
+                clarification_prompt = await self._run(self.llm_slots, clarify, question["query"])
+            result["clarification_prompt"] = clarification_prompt
+
+            sql = await self._run(self.llm_slots, generate_sql_for_query,
+                                  question["query"], clarification_prompt, question["clarification_response"])
+            result["sql"] = sql
+
+            table, table_summary = await self._run(self.db_slots, run_generated_sql, sql)
+            result["rows"] = None if table is None else len(table)
+            result["columns"] = None if table is None else list(table.columns)
+            if table is not None and self.tables_dir:
+                table_path = os.path.join(self.tables_dir, f"{question['id']}.csv")
+                await self._run(self.db_slots, functools.partial(table.to_csv, table_path, index=False))
+                result["table_path"] = table_path
+
+            result["text"] = await self._run(self.llm_slots, summarize_query_result,
+                                             question["query"], clarification_prompt,
+                                             question["clarification_response"], table, table_summary)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["elapsed_s"] = time.perf_counter() - start
+        return result
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+async def run_batch(questions: list[dict], output_path: str, llm_parallelism: int,
+                    db_parallelism: int, tables_dir: str | None = None) -> int:
+    """
+    Processes every question and writes results in completion order.
+    Returns the number of questions that failed.
+    """
+    if tables_dir:
+        os.makedirs(tables_dir, exist_ok=True)
+    runner = BatchRunner(llm_parallelism, db_parallelism, tables_dir)
+    failures = 0
+    try:
+        with open(output_path, "w", encoding="utf-8") as out:
+            for finished in asyncio.as_completed([runner.process(q) for q in questions]):
+                result = await finished
+                failures += "error" in result
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                print(f"  - {result['id']}: {'error' if 'error' in result else 'ok'} ({result['elapsed_s']:.1f}s)")
+    finally:
+        runner.close()
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of questions in batch.")
+    parser.add_argument("questions", help="JSON lines file of questions")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl")
+    parser.add_argument("--tables-dir", default=None, help="write each result table as <id>.csv in this folder")
+    parser.add_argument("--llm-parallelism", type=int, default=DEFAULT_LLM_PARALLELISM)
+    parser.add_argument("--db-parallelism", type=int, default=DEFAULT_DB_PARALLELISM)
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    warm_up()
+    print(f"Processing {len(questions)} questions...")
+    failures = asyncio.run(run_batch(questions, args.output, args.llm_parallelism,
+                                     args.db_parallelism, args.tables_dir))
+    print(f"Done: {len(questions) - failures} succeeded, {failures} failed. Results in '{args.output}'.")
+    raise SystemExit(1 if failures else 0)
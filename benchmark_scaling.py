@@ -0,0 +1,115 @@
+# benchmark of database build time, size and query latency on scaled-up copies of the raw datasets.
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from data_processing import build_database
+from data_scaler import SOURCES, scale_datasets
+
+# The scaler only writes CSVs (including the etat_travaux one that the default
+# source configs skip in favour of the workbook).
+SCALED_SOURCE_CONFIGS = {name: {"delimiter": spec["delimiter"]} for name, spec in SOURCES.items()}
+
+# Queries representative of what the SQL generation produces (aggregations per deputy,
+# petitions per status, case-insensitive filters as required by the prompt).
+BENCHMARK_QUERIES = {
+    "attendance_per_deputy": """
+        SELECT NAME, FIRSTNAME, COUNT(*) AS presences
+        FROM presence_seance_publique
+        WHERE LOWER(MEETING_PRESENCE) = LOWER('present')
+        GROUP BY NAME, FIRSTNAME
+        ORDER BY presences DESC;""",
+    "petitions_by_status": """
+        SELECT STATUS, COUNT(*) AS petitions
+        FROM petition
+        GROUP BY STATUS;""",
+    "attendance_of_party": """
+        SELECT *
+        FROM presence_seance_publique
+        WHERE LOWER(POLITICAL_PARTY) = LOWER('csv');""",
+    "bills_by_nature": """
+        SELECT *
+        FROM etat_travaux
+        WHERE LOWER(nature) = LOWER('Projet De Loi');""",
+}
+
+
+def time_query(conn, query, repeat=3):
+    """
+    Runs a query the way services.process_user_query does (fetchall, then a DataFrame)
+    and returns the best fetch and DataFrame build times in seconds with the row count.
+    """
+    best_fetch = best_frame = float("inf")
+    rows = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor = conn.execute(query)
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        fetched = time.perf_counter()
+        pd.DataFrame(rows, columns=columns)
+        built = time.perf_counter()
+        best_fetch = min(best_fetch, fetched - start)
+        best_frame = min(best_frame, built - fetched)
+    return {"fetch_s": best_fetch, "dataframe_s": best_frame, "rows": len(rows)}
+
+
+def run_benchmark(factors, input_folder, work_folder, repeat=3):
+    """
+    Generates, builds and queries a database for every scale factor.
+    Returns one result dict per factor.
+    """
+    results = []
+    for factor in factors:
+        folder = os.path.join(work_folder, f"x{factor:g}")
+        duck_path = os.path.join(folder, "000_duck.db")
+        sqlite_path = os.path.join(folder, "001_sqlite.db")
+
+        print(f"\nScale factor x{factor:g}")
+        start = time.perf_counter()
+        rows = scale_datasets(input_folder, os.path.join(folder, "csv"), factor)
+        generated = time.perf_counter()
+        build_database(os.path.join(folder, "csv"), duck_path, sqlite_path, SCALED_SOURCE_CONFIGS)
+        built = time.perf_counter()
+
+        result = {
+            "factor": factor,
+            "source_rows": rows,
+            "generate_s": generated - start,
+            "build_s": built - generated,
+            "db_bytes": os.path.getsize(sqlite_path) if os.path.exists(sqlite_path) else None,
+            "queries": {},
+        }
+        conn = sqlite3.connect(sqlite_path)
+        try:
+            for name, query in BENCHMARK_QUERIES.items():
+                try:
+                    result["queries"][name] = time_query(conn, query, repeat)
+                except sqlite3.Error as e:
+                    result["queries"][name] = {"error": str(e)}
+        finally:
+            conn.close()
+
+        results.append(result)
+        print(json.dumps(result, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and queries on scaled datasets.")
+    parser.add_argument("factors", type=float, nargs="*", default=[1, 10, 100])
+    parser.add_argument("--input", default="./raw_datasets")
+    parser.add_argument("--work-dir", default="./scaled_datasets")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="optional JSON file to write the results to")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.factors, args.input, args.work_dir, args.repeat)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
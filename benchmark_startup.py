@@ -0,0 +1,102 @@
+# benchmark of cold start: import time of the entry modules and warm-up duration,
+# compared against a recorded baseline to catch regressions.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Each measurement runs in a fresh interpreter and prints its duration in seconds.
+MEASUREMENTS = {
+    "import_services_s": (
+        "import time; start = time.perf_counter(); import services; "
+        "print(time.perf_counter() - start)"
+    ),
+    "import_llm_s": (
+        "import time; start = time.perf_counter(); import llm.generate_sql_select_query; "
+        "print(time.perf_counter() - start)"
+    ),
+    "warm_up_s": (
+        "import time; import startup; start = time.perf_counter(); startup.warm_up(); "
+        "print(time.perf_counter() - start)"
+    ),
+    "first_schema_read_s": (
+        "import time, services; start = time.perf_counter(); services.get_schema_info_from_db('json'); "
+        "print(time.perf_counter() - start)"
+    ),
+}
+
+
+def measure(code, repeat):
+    """
+    Returns the median of the durations printed by code over repeat fresh interpreters.
+    """
+    durations = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        durations.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(durations)
+
+
+def slowest_imports(module, count=10):
+    """
+    Returns the modules with the highest cumulative import time, from python -X importtime.
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        imports.append((int(cumulative) / 1e6, name))
+    return sorted(imports, reverse=True)[:count]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the measurements slower than their baseline by more than tolerance (a ratio).
+    """
+    regressions = {}
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference and value > reference * (1 + tolerance):
+            regressions[name] = {"baseline": reference, "current": value}
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import time and warm-up.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default="startup_baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown ratio, e.g. 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true", help="record these results as the new baseline")
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.repeat) for name, code in MEASUREMENTS.items()}
+    print(json.dumps(results, indent=2))
+    print("\nSlowest imports of services (cumulative seconds):")
+    for seconds, name in slowest_imports("services"):
+        print(f"  {seconds:8.3f}  {name}")
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to '{args.baseline}'.")
+        sys.exit(0)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print(f"\nStartup regressions over {args.tolerance:.0%}:")
+        print(json.dumps(regressions, indent=2))
+        sys.exit(1)
+    print("\nNo startup regression.")
@@ -1,5 +1,6 @@
 # script to load CSV files into DuckDB and convert to SQLite; use duckdb's schema inference.
 
+import datetime
 import os
 import re
 import sqlite3
@@ -7,6 +8,7 @@ import duckdb
 
 
 original = "001_sqlite.db"
+SQLITE_PAGE_SIZE = 16384  # Larger than the 4096 default: fewer page reads for the full scans of generated queries
 query_udpate1 = """UPDATE etat_travaux
 
 SET nature = CASE nature
@@ -132,6 +134,231 @@ def load_csv_files_as_separate_tables(csv_folder_path, db_file_path):
         print(f"what? An error occurred: {e}")
 
 
+# --- Source adapters: per-source settings, streaming XLSX, batched loading ---
+
+# Number of rows inserted at once when a source is streamed into DuckDB.
+BATCH_SIZE = 10_000
+
+# Per-source ingestion settings, keyed by file name. Files without an entry are loaded
+# with the defaults of their type (CSV: delimiter auto-detected, UTF-8 with optional BOM;
+# XLSX: first sheet, first row as header).
+#   delimiter, encoding: CSV only
+#   sheet:               XLSX only, name of the sheet to load
+#   header_renames:      explicit header fixes, applied before clean_header
+#   skip:                do not load this file
+SOURCE_CONFIGS = {
+    "102-petition.csv": {"delimiter": ",", "encoding": "utf-8"},
+    "107-presence-seance-publique.csv": {"delimiter": ",", "encoding": "utf-8"},
+    # The CSV is a manual export of the workbook, which is now loaded directly
+    "121-etat-travaux.csv": {"skip": True},
+    "121-etat-travaux.xlsx": {"sheet": "ETAT_TRAVAUX"},
+}
+
+SOURCE_EXTENSIONS = (".csv", ".xlsx")
+
+# DuckDB type of an XLSX column from the Python types openpyxl returned for its cells
+_XLSX_TYPES = [
+    ({int}, "BIGINT"),
+    ({int, float}, "DOUBLE"),
+    ({bool}, "BOOLEAN"),
+    ({datetime.date}, "DATE"),
+    ({datetime.date, datetime.datetime}, "TIMESTAMP"),
+]
+
+
+def clean_header(name, index):
+    """
+    Cleans a raw header: strips whitespace and BOM, drops characters that are neither
+    letters, digits, underscores nor spaces (e.g. the garbled 'Recev?'), and names
+    empty headers after their position.
+    """
+    cleaned = re.sub(r"[^\w ]", "", str(name if name is not None else "").replace("\ufeff", "")).strip()
+    return cleaned or f"column_{index + 1}"
+
+
+def clean_headers(raw_headers, config):
+    """
+    Applies the source's header_renames and clean_header, and makes the names unique.
+    """
+    renames = config.get("header_renames", {})
+    headers = []
+    for index, raw in enumerate(raw_headers):
+        name = clean_header(renames.get(raw, raw), index)
+        candidate, suffix = name, 2
+        while candidate in headers:
+            candidate, suffix = f"{name}_{suffix}", suffix + 1
+        headers.append(candidate)
+    return headers
+
+
+def _xlsx_cell_to_text(value):
+    """
+    Converts an openpyxl cell value to the text staged in DuckDB.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time(0, 0):
+            return value.date().isoformat()
+        return value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _xlsx_cell_kind(value):
+    if isinstance(value, datetime.datetime):
+        return datetime.date if value.time() == datetime.time(0, 0) else datetime.datetime
+    if isinstance(value, float) and value.is_integer():
+        return int
+    return type(value)
+
+
+def iter_xlsx_batches(xlsx_path, config, batch_size=BATCH_SIZE):
+    """
+    Streams a worksheet row by row (openpyxl read-only mode, cached formula values).
+    Yields the cleaned header first, then lists of at most batch_size rows.
+    """
+    import openpyxl  # only needed for workbooks
+
+    workbook = openpyxl.load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[config["sheet"]] if config.get("sheet") else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        raw_headers = next(rows, None)
+        if raw_headers is None:
+            return
+        yield clean_headers(raw_headers, config)
+
+        width = len(raw_headers)
+        batch = []
+        for row in rows:
+            if row is None or all(value is None for value in row):
+                continue
+            batch.append((tuple(row) + (None,) * width)[:width])
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        workbook.close()
+
+
+def load_xlsx_into_table(con, xlsx_path, table_name, config, batch_size=BATCH_SIZE):
+    """
+    Loads a worksheet into a DuckDB table in fixed-size batches, so memory stays flat
+    whatever the size of the workbook. Cells are staged as text and the column types
+    are derived from the cell types seen while streaming.
+    """
+    import pandas as pd
+
+    batches = iter_xlsx_batches(xlsx_path, config, batch_size)
+    headers = next(batches, None)
+    if headers is None:
+        print(f"  - '{xlsx_path}' has no header row, skipped.")
+        return
+
+    # A regular table, not a TEMP one: DuckDB keeps temporary tables in memory, while
+    # this one is written to the database file and dropped as soon as it has been copied.
+    staging = f"{table_name}__staging"
+    columns_sql = ", ".join(f'"{name}" VARCHAR' for name in headers)
+    con.execute(f'CREATE OR REPLACE TABLE "{staging}" ({columns_sql});')
+    try:
+        kinds = [set() for _ in headers]
+        for batch in batches:
+            for row in batch:
+                for index, value in enumerate(row):
+                    if value is not None:
+                        kinds[index].add(_xlsx_cell_kind(value))
+            frame = pd.DataFrame([[_xlsx_cell_to_text(v) for v in row] for row in batch], columns=headers, dtype=object)
+            con.register("xlsx_batch", frame)
+            con.execute(f'INSERT INTO "{staging}" SELECT * FROM xlsx_batch;')
+            con.unregister("xlsx_batch")
+
+        selects = []
+        for name, seen in zip(headers, kinds):
+            duck_type = next((t for allowed, t in _XLSX_TYPES if seen and seen <= allowed), "VARCHAR")
+            selects.append(f'CAST("{name}" AS {duck_type}) AS "{name}"')
+        con.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT {", ".join(selects)} FROM "{staging}";')
+    finally:
+        con.execute(f'DROP TABLE IF EXISTS "{staging}";')
+
+
+def load_csv_into_table(con, csv_path, table_name, config):
+    """
+    Loads a CSV into a DuckDB table with the source's delimiter and encoding (DuckDB
+    reads the file in chunks, so memory stays flat), renaming columns to cleaned headers.
+    """
+    options = ["header=TRUE", "auto_detect=TRUE"]
+    if config.get("delimiter"):
+        options.append(f"delim='{config['delimiter']}'")
+    if config.get("encoding"):
+        options.append(f"encoding='{config['encoding']}'")
+    source = f"read_csv('{csv_path}', {', '.join(options)})"
+
+    raw_headers = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {source};").fetchall()]
+    headers = clean_headers(raw_headers, config)
+    selects = ", ".join(f'"{raw}" AS "{name}"' for raw, name in zip(raw_headers, headers))
+    con.execute(f'CREATE OR REPLACE TABLE "{table_name}" AS SELECT {selects} FROM {source};')
+
+
+def load_source_files_as_separate_tables(source_folder_path, db_file_path, batch_size=BATCH_SIZE,
+                                         source_configs=SOURCE_CONFIGS):
+    """
+    Loads each CSV and XLSX file of a folder into its own DuckDB table, using the
+    per-source settings of source_configs. The table name is derived from the filename;
+    when two files map to the same table, the first one found is kept.
+
+    Args:
+        source_folder_path (str): The path to the folder containing the source files.
+        db_file_path (str): The path where the DuckDB database file will be created/stored.
+        batch_size (int): Rows inserted at once for streamed sources (XLSX).
+        source_configs (dict): Per-source settings keyed by file name.
+    """
+    con = duckdb.connect(database=db_file_path, read_only=False)
+    try:
+        source_files = []
+        for root, _, files in os.walk(source_folder_path):
+            for file in sorted(files):
+                if file.lower().endswith(SOURCE_EXTENSIONS):
+                    source_files.append(os.path.join(root, file))
+
+        loaded_tables = {}
+        for source_path in source_files:
+            filename = os.path.basename(source_path)
+            config = source_configs.get(filename, {})
+            if config.get("skip"):
+                print(f"  - Skipping '{source_path}' (disabled in source configs).")
+                continue
+
+            table_name = parse_filename(os.path.splitext(filename)[0])
+            if not table_name:
+                print(f"Skipping source with invalid table name derived from: {source_path}")
+                continue
+            if table_name in loaded_tables:
+                print(f"  - Skipping '{source_path}': table '{table_name}' already loaded from '{loaded_tables[table_name]}'.")
+                continue
+
+            try:
+                if filename.lower().endswith(".xlsx"):
+                    load_xlsx_into_table(con, source_path, table_name, config, batch_size)
+                else:
+                    load_csv_into_table(con, source_path, table_name, config)
+            except Exception as e:
+                print(f"  - Failed to load '{source_path}': {e}")
+                continue
+            loaded_tables[table_name] = source_path
+            print(f"  - Loaded '{source_path}' into table '{table_name}'.")
+
+        print(f"\nLoaded {len(loaded_tables)} source files into '{db_file_path}' as separate tables.")
+        print(con.execute("SHOW TABLES;").fetchdf())
+    finally:
+        con.close()
+
+
 def _convert_duckdb_to_sqlite(duckdb_file, sqlite_file):
     """
     Converts a DuckDB database to a SQLite database by copying all tables.
@@ -158,21 +385,66 @@ def _convert_duckdb_to_sqlite(duckdb_file, sqlite_file):
         print(f"An error occurred during the conversion: {e}")
 
 
-def convert_duckdb_to_sqlite(duckdb_file, sqlite_file):
+# Source headers that clean_header renames, as they may still appear in table_metadata
+METADATA_COLUMN_RENAMES = {raw: clean_header(raw, 0) for raw in ["Recev?"]}
+
+
+def rename_columns_in_table_metadata(con, renames=METADATA_COLUMN_RENAMES):
+    """
+    Replaces the raw column names of renames by their cleaned names in every text column
+    of table_metadata, so the schema given to the LLM names columns that exist.
+    Does nothing if the database has no table_metadata.
+    """
+    columns = [row[1] for row in con.execute("PRAGMA table_info(table_metadata);")]
+    for column in columns:
+        for old, new in renames.items():
+            con.execute(
+                f'UPDATE table_metadata SET "{column}" = REPLACE("{column}", ?, ?) '
+                f'WHERE typeof("{column}") = \'text\' AND instr("{column}", ?) > 0;',
+                (old, new, old),
+            )
+
+
+def has_table_metadata(sqlite_file):
+    """
+    Tells whether a SQLite database file exists and has a table_metadata table.
+    """
+    if not os.path.exists(sqlite_file):
+        return False
+    try:
+        con = sqlite3.connect(f"file:{sqlite_file}?mode=ro", uri=True)
+        try:
+            return con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'table_metadata';"
+            ).fetchone() is not None
+        finally:
+            con.close()
+    except sqlite3.Error:
+        return False
+
+
+def convert_duckdb_to_sqlite(duckdb_file, sqlite_file, metadata_file=original):
     """
     Converts a DuckDB database to a SQLite database by copying all tables.
 
     Args:
         duckdb_file (str): Path to the existing DuckDB database file.
         sqlite_file (str): Path where the new SQLite database file will be created.
+        metadata_file (str): SQLite database the table_metadata table is copied from.
+
+    Returns:
+        bool: True if the conversion succeeded.
     """
     try:
         con_duck = duckdb.connect(database=duckdb_file)
         con_duck.execute("INSTALL sqlite; LOAD sqlite;")
         con_duck.execute(f"ATTACH '{sqlite_file}' AS new_sqlite_db (TYPE sqlite);")
-        con_duck.execute(f"ATTACH '{original}' AS original (TYPE sqlite);")
-        con_duck.sql("""create or replace table table_metadata as (select * from original.table_metadata)
+        if has_table_metadata(metadata_file):
+            con_duck.execute(f"ATTACH '{metadata_file}' AS original (TYPE sqlite, READ_ONLY);")
+            con_duck.sql("""create or replace table table_metadata as (select * from original.table_metadata)
     """)
+        else:
+            print(f"No table_metadata in '{metadata_file}', the new database will have none.")
         duckdb_tables = con_duck.execute("SHOW TABLES;").fetchall()
 
         for table_name_tuple in duckdb_tables:
@@ -186,10 +458,80 @@ def convert_duckdb_to_sqlite(duckdb_file, sqlite_file):
             cur = con.cursor()
             cur.execute(query_udpate1)
             cur.execute(query_udpate2)
+            rename_columns_in_table_metadata(con)
             con.commit()
+        return True
 
     except Exception as e:
         print(f"An error occurred during the conversion: {e}")
+        return False
+
+
+def finalize_sqlite(sqlite_file, page_size=SQLITE_PAGE_SIZE):
+    """
+    Prepares a freshly built SQLite database for serving: sets its page size, gathers the
+    query planner statistics (ANALYZE) and rewrites it compactly (VACUUM, which also
+    applies the page size). Raises sqlite3.DatabaseError if the result is corrupt.
+    """
+    con = sqlite3.connect(sqlite_file)
+    try:
+        con.execute(f"PRAGMA page_size = {int(page_size)};")
+        con.execute("PRAGMA journal_mode = DELETE;")  # No -wal file left next to the swapped file
+        con.execute("ANALYZE;")
+        con.commit()
+        con.execute("VACUUM;")
+        status = con.execute("PRAGMA quick_check;").fetchone()[0]
+        if status != "ok":
+            raise sqlite3.DatabaseError(f"Integrity check of '{sqlite_file}' failed: {status}")
+    finally:
+        con.close()
+
+
+def build_database(csv_folder_path, db_file_path, sqlite_file_path, source_configs=SOURCE_CONFIGS,
+                   page_size=SQLITE_PAGE_SIZE):
+    """
+    Builds the SQLite database from scratch out of the source files of a folder, without
+    touching the current database until the new one is complete.
+
+    The new database is written to a versioned temporary file next to sqlite_file_path,
+    finalized (see finalize_sqlite) and then atomically swapped into place with os.replace:
+    readers see either the old or the new database, never a partial one, and connections
+    opened on the old file keep reading it until they are closed (see db_utils).
+    table_metadata is copied over from the database being replaced, or from the original
+    database when the one being replaced has none.
+
+    Args:
+        csv_folder_path (str): The path to the folder containing the source files.
+        db_file_path (str): The path of the intermediate DuckDB database file.
+        sqlite_file_path (str): The path of the SQLite database file to create or replace.
+        source_configs (dict): Per-source settings keyed by file name.
+        page_size (int): SQLite page size of the new database, in bytes.
+
+    Returns:
+        str: The version of the new database, also kept in the temporary file names.
+    """
+    version = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+    duck_root, duck_ext = os.path.splitext(db_file_path)
+    sqlite_root, sqlite_ext = os.path.splitext(sqlite_file_path)
+    temp_duck_path = f"{duck_root}.{version}.building{duck_ext}"
+    temp_sqlite_path = f"{sqlite_root}.{version}.building{sqlite_ext}"
+    # Databases built without table_metadata (first build, scaled benchmark copies) take it from the original
+    metadata_file = sqlite_file_path if has_table_metadata(sqlite_file_path) else original
+
+    try:
+        load_source_files_as_separate_tables(csv_folder_path, temp_duck_path, source_configs=source_configs)
+        if not convert_duckdb_to_sqlite(temp_duck_path, temp_sqlite_path, metadata_file):
+            raise RuntimeError(f"Could not build '{sqlite_file_path}', the current database is left unchanged.")
+        finalize_sqlite(temp_sqlite_path, page_size)
+        os.replace(temp_sqlite_path, sqlite_file_path)
+        print(f"Database version {version} is now in place at '{sqlite_file_path}'.")
+        # The intermediate DuckDB database is kept at its usual path for inspection
+        os.replace(temp_duck_path, db_file_path)
+    finally:
+        for path in (temp_duck_path, temp_sqlite_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return version
 
 
 if __name__ == "__main__":
@@ -198,5 +540,4 @@ if __name__ == "__main__":
     db_file_path = "000_duck.db"  
     sqlite_file_path = "001_sqlite.db"
 
-    load_csv_files_as_separate_tables(csv_folder_path, db_file_path)
-    convert_duckdb_to_sqlite(db_file_path, sqlite_file_path)
+    build_database(csv_folder_path, db_file_path, sqlite_file_path)
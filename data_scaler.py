@@ -0,0 +1,247 @@
+# script to generate scaled-up synthetic copies of the raw datasets for ingestion and query benchmarks.
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import re
+
+# Per-source generation rules. Columns not listed here are profiled and generated
+# from their observed distribution (see profile_column / generate_value).
+#   delimiter: field separator of the source file
+#   keys:      integer identifiers, shifted per synthetic copy so they stay unique
+#              (and so rows sharing a key in the source still share it in the copy)
+#   groups:    columns describing one entity; they are remapped together so that
+#              e.g. a deputy keeps the same name, title and party within a copy
+#   suffixed:  group columns that get a copy suffix, so that the number of distinct
+#              entities grows with the scale factor
+#   fixed:     columns that describe the key they belong to and are copied unchanged
+#   derived:   columns rebuilt from other columns of the generated row
+SOURCES = {
+    "102-petition.csv": {
+        "delimiter": ",",
+        "keys": ["PETITION_NBR"],
+        "groups": [["ASSOCIATION_ROLE", "ASSOCIATION_NAME", "RESIDENCY_COUNTRY"]],
+        "suffixed": ["ASSOCIATION_NAME"],
+        "fixed": [],
+        "derived": {},
+    },
+    "107-presence-seance-publique.csv": {
+        "delimiter": ",",
+        "keys": ["LEGISLATURE_NUMBER", "SESSION_NUMBER"],
+        "groups": [["PERSON_TITLE", "NAME", "FIRSTNAME", "POLITICAL_GROUP", "POLITICAL_PARTY"]],
+        "suffixed": ["NAME"],
+        "fixed": ["MEETING_DATE", "MEETING_NUMBER"],
+        "derived": {},
+    },
+    "121-etat-travaux.csv": {
+        "delimiter": ";",
+        "keys": ["Dossier"],
+        "groups": [],
+        "suffixed": [],
+        "fixed": [],
+        "derived": {"Adresse": "https://www.chd.lu/fr/dossier/{Dossier}"},
+    },
+}
+
+# A column is treated as categorical when it has at most this many distinct values,
+# or when its distinct values make up at most this share of its non-empty values.
+CATEGORICAL_MAX_DISTINCT = 50
+CATEGORICAL_MAX_RATIO = 0.05
+
+INTEGER_RE = re.compile(r"^-?\d+$")
+# Numbers, dates and times ("12", "18/07/2006", "04.12.18", "30/01/2024 14:30:00")
+NUMERIC_RE = re.compile(r"^[\d.,/: -]+$")
+
+
+def read_source(csv_path, delimiter):
+    """
+    Reads a raw dataset (optionally BOM-prefixed) and returns (header, rows).
+    """
+    with open(csv_path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader)
+        rows = [row + [""] * (len(header) - len(row)) for row in reader]
+    return header, rows
+
+
+def profile_column(values):
+    """
+    Learns the distribution of a single column.
+
+    Returns a dict with the null fraction, the number of distinct values, the kind of
+    column ("categorical", "numeric" or "text") and, for categorical and numeric
+    columns, the observed values with their cumulative frequencies.
+    """
+    non_null = [v for v in values if v != ""]
+    distinct = {}
+    for value in non_null:
+        distinct[value] = distinct.get(value, 0) + 1
+
+    profile = {
+        "null_fraction": (len(values) - len(non_null)) / len(values) if values else 0.0,
+        "cardinality": len(distinct),
+    }
+    if non_null and (len(distinct) <= CATEGORICAL_MAX_DISTINCT
+                     or len(distinct) / len(non_null) <= CATEGORICAL_MAX_RATIO):
+        profile["kind"] = "categorical"
+    elif non_null and all(NUMERIC_RE.match(v) for v in distinct):
+        profile["kind"] = "numeric"
+    else:
+        profile["kind"] = "text"
+    profile["values"] = list(distinct.keys())
+    profile["cum_weights"] = list(itertools.accumulate(distinct.values()))
+    return profile
+
+
+def profile_source(header, rows, spec):
+    """
+    Profiles every column of a source and collects the observed entity tuples of each group.
+    """
+    columns = {name: profile_column([row[i] for row in rows]) for i, name in enumerate(header)}
+
+    key_spans = {}
+    for key in spec["keys"]:
+        index = header.index(key)
+        ints = [int(row[index]) for row in rows if INTEGER_RE.match(row[index])]
+        key_spans[key] = (max(ints) - min(ints) + 1) if ints else 1
+
+    groups = []
+    for group in spec["groups"]:
+        indexes = [header.index(name) for name in group]
+        tuples = {}
+        for row in rows:
+            entity = tuple(row[i] for i in indexes)
+            tuples[entity] = tuples.get(entity, 0) + 1
+        suffixed = [position for position, name in enumerate(group) if name in spec["suffixed"]]
+        groups.append({"columns": group, "indexes": indexes, "entities": list(tuples.keys()),
+                       "suffixed": suffixed})
+
+    return {"columns": columns, "key_spans": key_spans, "groups": groups}
+
+
+def generate_value(value, profile, copy_index, rng):
+    """
+    Generates the value of a non-key, non-group column for one synthetic row.
+
+    Categorical and numeric columns (dates included) are resampled from their observed
+    distribution, keeping the null fraction, while free text keeps the source value
+    with a copy suffix so that its cardinality grows with the scale factor.
+    """
+    if profile["kind"] == "text":
+        if value == "" or copy_index == 0:
+            return value
+        return f"{value} [{copy_index}]"
+    if rng.random() < profile["null_fraction"] or not profile["values"]:
+        return ""
+    return rng.choices(profile["values"], cum_weights=profile["cum_weights"])[0]
+
+
+def _remap_group(group, copy_index, rng):
+    """
+    Builds a deterministic mapping from each observed entity to a synthetic one for a copy.
+
+    Source entities are shuffled as whole tuples, so the fields of a synthetic entity
+    always come from one real entity (a deputy keeps a party of their own group), and
+    the suffixed fields get the copy number, so the number of distinct entities grows
+    with the number of copies. Inside a copy every source entity is always replaced by
+    the same synthetic entity.
+    """
+    if copy_index == 0:
+        return {entity: entity for entity in group["entities"]}
+    drawn = rng.sample(group["entities"], len(group["entities"]))
+    mapping = {}
+    for entity, synthetic in zip(group["entities"], drawn):
+        synthetic = list(synthetic)
+        for position in group["suffixed"]:
+            if synthetic[position]:
+                synthetic[position] = f"{synthetic[position]} [{copy_index}]"
+        mapping[entity] = tuple(synthetic)
+    return mapping
+
+
+def scale_rows(header, rows, profile, spec, factor, seed=0):
+    """
+    Yields round(len(rows) * factor) synthetic rows for a source.
+
+    The output is built from successive copies of the source rows: copy 0 is the source
+    itself, later copies shift key columns by a multiple of their span, remap entity
+    groups, keep fixed columns and resample the remaining columns.
+    """
+    rng = random.Random(seed)
+    target = round(len(rows) * factor)
+    key_indexes = {header.index(key): profile["key_spans"][key] for key in spec["keys"]}
+    kept_indexes = {i for group in profile["groups"] for i in group["indexes"]}
+    kept_indexes.update(header.index(name) for name in spec["fixed"])
+    derived = {header.index(name): template for name, template in spec["derived"].items()}
+    profiles = [profile["columns"][name] for name in header]
+
+    produced = 0
+    copy_index = 0
+    while produced < target:
+        mappings = [_remap_group(group, copy_index, rng) for group in profile["groups"]]
+        for row in rows:
+            if produced >= target:
+                break
+            out = list(row)
+            for i, value in enumerate(row):
+                if i in key_indexes:
+                    if INTEGER_RE.match(value):
+                        out[i] = str(int(value) + copy_index * key_indexes[i])
+                elif i not in kept_indexes and i not in derived and copy_index > 0:
+                    out[i] = generate_value(value, profiles[i], copy_index, rng)
+            for group, mapping in zip(profile["groups"], mappings):
+                entity = mapping[tuple(row[i] for i in group["indexes"])]
+                for i, value in zip(group["indexes"], entity):
+                    out[i] = value
+            if copy_index > 0:
+                fields = dict(zip(header, out))
+                for i, template in derived.items():
+                    out[i] = template.format(**fields)
+            yield out
+            produced += 1
+        copy_index += 1
+
+
+def scale_datasets(input_folder, output_folder, factor, seed=0):
+    """
+    Writes a scaled-up copy of every known source of input_folder into output_folder,
+    keeping the file names, delimiters and BOM of the originals.
+
+    Returns a dict mapping each written file name to its number of data rows.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    written = {}
+    for filename, spec in SOURCES.items():
+        source_path = os.path.join(input_folder, filename)
+        if not os.path.exists(source_path):
+            print(f"Skipping missing source '{source_path}'.")
+            continue
+
+        header, rows = read_source(source_path, spec["delimiter"])
+        profile = profile_source(header, rows, spec)
+
+        target_path = os.path.join(output_folder, filename)
+        count = 0
+        with open(target_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter=spec["delimiter"])
+            writer.writerow(header)
+            for row in scale_rows(header, rows, profile, spec, factor, seed):
+                writer.writerow(row)
+                count += 1
+        written[filename] = count
+        print(f"  - Wrote {count} rows to '{target_path}' (x{factor}).")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate scaled-up copies of the raw datasets.")
+    parser.add_argument("factor", type=float, help="scale factor, e.g. 10 or 1000")
+    parser.add_argument("--input", default="./raw_datasets")
+    parser.add_argument("--output", default=None, help="defaults to ./scaled_datasets/x<factor>")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    output = args.output or os.path.join("./scaled_datasets", f"x{args.factor:g}")
+    scale_datasets(args.input, output, args.factor, args.seed)
@@ -3,43 +3,152 @@
 import streamlit as st
 import sqlite3
 import os
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 
 DEFAULT_DB_NAME = "001_sqlite.db"
+PAGE_CACHE_KIB = 64 * 1024 # SQLite page cache per connection (negative cache_size is in KiB)
 
-@st.cache_resource # Caches the database connection across Streamlit reruns
-def get_db_connection(db_name: str = DEFAULT_DB_NAME) -> sqlite3.Connection | None:
+def get_db_path(db_name: str = DEFAULT_DB_NAME) -> str:
     """
-    Establishes and returns a cached SQLite database connection.
-    Enables foreign key support and sets row_factory for named column access.
+    Returns the absolute path of a database file of the project root directory.
     """
     # Construct path relative to the directory of this script (db_utils.py)
     # Assuming db_utils.py, app.py, services.py, and the .db file are in the same root project directory.
     project_root = os.path.dirname(os.path.abspath(__file__))
-    db_path = os.path.join(project_root, db_name)
+    return os.path.join(project_root, db_name)
 
-    if not os.path.exists(db_path):
-        st.error(f"Database file '{db_name}' not found at '{db_path}'. Please ensure it exists.")
-        return None
+class _DbGeneration:
+    """
+    One generation of a database file (one file swapped into place by a rebuild) and its
+    connection. Retired generations are closed once their last user releases them.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, file_id: tuple[int, int], number: int):
+        self.conn = conn
+        self.file_id = file_id
+        self.number = number
+        self.active = 0
+        self.retired = False
+
+# Current generation per database name, shared by all sessions of the process
+_generations: dict[str, _DbGeneration] = {}
+_generations_lock = threading.Lock()
+_reload_listeners: list[Callable[[str, int], None]] = []
+
+def add_reload_listener(listener: Callable[[str, int], None]) -> None:
+    """
+    Registers listener(db_name, generation number), called after a new generation of a
+    database has been opened, e.g. to warm caches for it.
+    """
+    _reload_listeners.append(listener)
+
+def _file_id(db_path: str) -> tuple[int, int]:
+    # Rebuilds swap a new file into place with os.replace, which changes the inode, while
+    # writes to the current file do not
+    stat = os.stat(db_path)
+    return stat.st_dev, stat.st_ino
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # Access columns by name
+    conn.execute('PRAGMA foreign_keys = ON') # Enforce foreign key constraints
+    conn.execute(f'PRAGMA cache_size = -{PAGE_CACHE_KIB}') # Keep the warmed-up pages in memory
+    return conn
+
+def _release(generation: _DbGeneration) -> None:
+    with _generations_lock:
+        generation.active -= 1
+        if generation.retired and generation.active == 0:
+            generation.conn.close()
+
+def _current_generation(db_name: str, lease: bool = False) -> _DbGeneration | None:
+    """
+    Returns the generation of the file currently at the database path, opening it if the
+    file was swapped since the last call. The previous generation is retired: queries
+    already running on it finish, then its connection is closed.
+    With lease=True the generation is marked in use and must be passed to _release().
+    """
+    db_path = get_db_path(db_name)
     try:
-        conn = sqlite3.connect(db_path, check_same_thread=False)
-        conn.row_factory = sqlite3.Row  # Access columns by name
-        conn.execute('PRAGMA foreign_keys = ON') # Enforce foreign key constraints
-        # st.toast(f"Successfully connected to '{db_name}'", icon="🗄️") # Optional: for first connection
-        return conn
-    except sqlite3.Error as e:
-        st.error(f"SQLite error connecting to database '{db_name}': {e}")
+        file_id = _file_id(db_path)
+    except FileNotFoundError:
+        st.error(f"Database file '{db_name}' not found at '{db_path}'. Please ensure it exists.")
         return None
 
-def fetch_query(query: str, params=None, db_name: str = DEFAULT_DB_NAME) -> list[sqlite3.Row]:
+    with _generations_lock:
+        previous = _generations.get(db_name)
+        if previous is not None and previous.file_id == file_id:
+            if lease:
+                previous.active += 1
+            return previous
+        try:
+            conn = _open_connection(db_path)
+        except sqlite3.Error as e:
+            st.error(f"SQLite error connecting to database '{db_name}': {e}")
+            return None
+        current = _DbGeneration(conn, file_id, previous.number + 1 if previous else 1)
+        if lease:
+            current.active += 1
+        _generations[db_name] = current
+        if previous is not None:
+            previous.retired = True
+            if previous.active == 0:
+                previous.conn.close()
+
+    if previous is not None:
+        print(f"Database '{db_name}' was rebuilt, switched to generation {current.number}.")
+        for listener in _reload_listeners:
+            try:
+                listener(db_name, current.number)
+            except Exception as e:
+                print(f"Database reload listener failed: {e}")
+    return current
+
+def get_db_connection(db_name: str = DEFAULT_DB_NAME) -> sqlite3.Connection | None:
     """
-    Executes a SELECT query and returns all rows as a list of sqlite3.Row objects.
-    Returns an empty list if the connection fails or the query errors.
+    Returns the shared SQLite connection of the current generation of the database.
+    Enables foreign key support and sets row_factory for named column access.
+    The connection is closed once a rebuilt database replaces its file and no query uses
+    it anymore, so queries should go through db_connection() rather than keep it.
     """
-    conn = get_db_connection(db_name)
-    if conn is None:
-        return [], None
+    generation = _current_generation(db_name)
+    return generation.conn if generation else None
 
+def get_db_generation(db_name: str = DEFAULT_DB_NAME) -> int | None:
+    """
+    Returns the generation number of the database file in use (1 for the file found at
+    startup, incremented by every rebuild), to key caches derived from its content.
+    """
+    generation = _current_generation(db_name)
+    return generation.number if generation else None
+
+@contextmanager
+def db_connection(db_name: str = DEFAULT_DB_NAME) -> Iterator[sqlite3.Connection | None]:
+    """
+    Yields the connection of the current generation and keeps that generation open until
+    the block exits, even if the database is swapped meanwhile. Yields None if it cannot
+    be opened.
+    """
+    generation = _current_generation(db_name, lease=True)
+    if generation is None:
+        yield None
+        return
     try:
+        yield generation.conn
+    finally:
+        _release(generation)
+
+def run_select(query: str, params=None, db_name: str = DEFAULT_DB_NAME) -> tuple[list[sqlite3.Row], list[str] | None]:
+    """
+    Executes a SELECT query and returns (rows, column names).
+    Raises sqlite3.Error if the database cannot be opened or the query fails, for callers
+    that need the error itself (batch runs, the HTTP API) rather than a message in the UI.
+    """
+    with db_connection(db_name) as conn:
+        if conn is None:
+            raise sqlite3.OperationalError(f"Database '{db_name}' could not be opened.")
         cursor = conn.cursor() # Use a cursor explicitly
         cursor.execute(query, params or ())
         rows = cursor.fetchall()
@@ -48,6 +157,14 @@ def fetch_query(query: str, params=None, db_name: str = DEFAULT_DB_NAME) -> list
         # or was not a SELECT statement.
         column_names = [desc[0] for desc in cursor.description] if cursor.description else None
         return rows, column_names
+
+def fetch_query(query: str, params=None, db_name: str = DEFAULT_DB_NAME) -> list[sqlite3.Row]:
+    """
+    Executes a SELECT query and returns all rows as a list of sqlite3.Row objects.
+    Returns an empty list if the connection fails or the query errors.
+    """
+    try:
+        return run_select(query, params, db_name)
     except sqlite3.Error as e:
         st.error(f"SQLite query error: {e} (Query: {query[:100]}...)")
         return [], None
@@ -58,18 +175,18 @@ def execute_CUD_query(query: str, params=None, db_name: str = DEFAULT_DB_NAME) -
     Commits on success, rolls back on error.
     Returns the number of rows affected on success, or False on failure.
     """
-    conn = get_db_connection(db_name)
-    if conn is None:
-        return False
+    with db_connection(db_name) as conn:
+        if conn is None:
+            return False
 
-    try:
-        cursor = conn.execute(query, params or ())
-        conn.commit()
-        return cursor.rowcount
-    except sqlite3.Error as e:
-        st.error(f"SQLite modification error: {e} (Query: {query[:100]}...)")
         try:
-            conn.rollback()
-        except sqlite3.Error as re:
-            st.warning(f"SQLite rollback error: {re}")
-        return False
\ No newline at end of file
+            cursor = conn.execute(query, params or ())
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            st.error(f"SQLite modification error: {e} (Query: {query[:100]}...)")
+            try:
+                conn.rollback()
+            except sqlite3.Error as re:
+                st.warning(f"SQLite rollback error: {re}")
+            return False
\ No newline at end of file
@@ -0,0 +1,42 @@
+# followup_engine.py
+
+from __future__ import annotations
+import re
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+# Name under which the previous result is exposed to follow-up queries.
+RESULT_TABLE_NAME = "previous_result"
+
+_FENCE_RE = re.compile(r"^```(?:sql)?\s*|\s*```$", re.IGNORECASE)
+
+
+def describe_result_table(table: pa.Table) -> list[tuple[str, str]]:
+    """
+    Returns the (column name, type) pairs of a result, used as the follow-up schema.
+    """
+    return [(field.name, str(field.type)) for field in table.schema]
+
+
+def clean_generated_sql(sql: str) -> str:
+    """
+    Strips markdown fences and trailing semicolons the model may add despite the prompt.
+    """
+    return _FENCE_RE.sub("", sql.strip()).strip().rstrip(";").strip()
+
+
+def run_follow_up_sql(sql: str, table: pa.Table) -> pd.DataFrame:
+    """
+    Runs a follow-up query against the previous result in an in-memory DuckDB database.
+
+    The result is the only table available and file system access is disabled, so a query
+    that needs any other data fails with a duckdb.Error instead of reaching the database.
+    """
+    con = duckdb.connect(database=":memory:", config={"enable_external_access": False})
+    try:
+        con.register(RESULT_TABLE_NAME, table)
+        return con.execute(clean_generated_sql(sql)).df()
+    finally:
+        con.close()
@@ -0,0 +1,30 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# services.py reads API_KEY, the llm modules historically read GEMINI_API_KEY
+API_KEY = os.environ.get('API_KEY') or os.environ.get('GEMINI_API_KEY')  # None if neither is set
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    """
+    Returns the google.generativeai module, imported on first use and configured once
+    per process, so importing services or the llm package stays cheap and requests do
+    not reconfigure the client.
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if API_KEY:
+                    genai.configure(api_key=API_KEY)
+                else:
+                    print("WARNING: API_KEY / GEMINI_API_KEY not found in .env. Gemini calls will fail.")
+                _genai = genai
+    return _genai
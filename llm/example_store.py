@@ -0,0 +1,337 @@
+"""
+Store of verified (question, clarification, SQL) examples and the lexical index used to
+pick the few-shot examples of the SQL generation prompt.
+
+The examples live in verified_examples.jsonl (one JSON object per line). The BM25 index
+is built locally from that file, without any network call, and saved next to it; it is
+rebuilt automatically whenever the examples change.
+
+    python -m llm.example_store build                 # (re)build the index
+    python -m llm.example_store search "question"     # show the examples a question gets
+    python -m llm.example_store check 001_sqlite.db   # run every example against a database
+    python -m llm.example_store add --question ... --clarification ... --sql ...
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from .llm_scheduler import estimate_tokens
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verified_examples.jsonl')
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verified_examples.index.json')
+
+TOP_K = int(os.environ.get('FEW_SHOT_TOP_K', '3'))
+TOKEN_BUDGET = int(os.environ.get('FEW_SHOT_TOKEN_BUDGET', '400'))
+# Examples scoring below this are too far from the question to help.
+MIN_SCORE = float(os.environ.get('FEW_SHOT_MIN_SCORE', '1.5'))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words that say nothing about the data asked for (questions mix English and French).
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'give',
+    'have', 'how', 'i', 'in', 'is', 'it', 'list', 'me', 'many', 'much', 'of', 'on', 'or', 'please',
+    'show', 'that', 'the', 'their', 'there', 'this', 'to', 'was', 'were', 'what', 'which', 'who',
+    'with', 'all', 'au', 'aux', 'ce', 'combien', 'dans', 'de', 'des', 'du', 'en', 'est', 'et',
+    'il', 'la', 'le', 'les', 'pour', 'quel', 'quelle', 'quelles', 'quels', 'qui', 'sont', 'sur',
+    'un', 'une',
+}
+
+
+def tokenize(text):
+    """
+    Lowercases, strips accents, drops stopwords and plural s, so 'Pétitions' matches 'petition'.
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    tokens = []
+    for token in re.findall(r'[a-z0-9]+', text):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def example_text(example):
+    return f"{example['question']} {example.get('clarification', '')}"
+
+
+def load_examples(path=EXAMPLES_PATH):
+    """
+    Reads the verified examples, skipping blank lines.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def fingerprint(examples):
+    return hashlib.sha256(json.dumps(examples, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ExampleIndex:
+    """
+    BM25 index over the question and clarification of every example.
+    """
+
+    def __init__(self, examples, postings, doc_lengths, source_fingerprint):
+        self.examples = examples
+        self.postings = postings  # term -> [[example index, term frequency], ...]
+        self.doc_lengths = doc_lengths
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self.fingerprint = source_fingerprint
+
+    @classmethod
+    def build(cls, examples):
+        postings = {}
+        doc_lengths = []
+        for doc, example in enumerate(examples):
+            tokens = tokenize(example_text(example))
+            doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, []).append([doc, count])
+        return cls(examples, postings, doc_lengths, fingerprint(examples))
+
+    def to_dict(self):
+        return {'fingerprint': self.fingerprint, 'examples': self.examples,
+                'postings': self.postings, 'doc_lengths': self.doc_lengths}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['examples'], data['postings'], data['doc_lengths'], data['fingerprint'])
+
+    def idf(self, term):
+        matching = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.examples) - matching + 0.5) / (matching + 0.5))
+
+    def search(self, query, k=TOP_K):
+        """
+        Returns up to k (score, example) pairs, best first.
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf(term)
+            for doc, count in self.postings.get(term, ()):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc] / self.avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        return [(score, self.examples[doc]) for doc, score in best]
+
+
+def build_index(examples_path=EXAMPLES_PATH, index_path=INDEX_PATH):
+    """
+    Builds the index from the examples file and saves it. Returns the index.
+    """
+    index = ExampleIndex.build(load_examples(examples_path))
+    with open(index_path, 'w', encoding='utf-8') as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False)
+    return index
+
+
+def load_index(examples_path=EXAMPLES_PATH, index_path=INDEX_PATH):
+    """
+    Loads the saved index, rebuilding it when it is missing or older than the examples.
+    """
+    examples = load_examples(examples_path)
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                index = ExampleIndex.from_dict(json.load(f))
+            if index.fingerprint == fingerprint(examples):
+                return index
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Example index unreadable, rebuilding it: {e}")
+    try:
+        return build_index(examples_path, index_path)
+    except OSError as e:
+        print(f"Could not save the example index, keeping it in memory: {e}")
+        return ExampleIndex.build(examples)
+
+
+def add_example(question, clarification, sql, examples_path=EXAMPLES_PATH):
+    """
+    Appends a verified example. The index picks it up on its next load.
+    """
+    example = {'question': question, 'clarification': clarification, 'sql': sql.strip()}
+    with open(examples_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(example, ensure_ascii=False) + '\n')
+    reset_example_index()
+    return example
+
+
+def check_examples(db_path, examples_path=EXAMPLES_PATH):
+    """
+    Runs every example query against a database, read-only.
+    Returns (example, error message) for the ones that fail or return no rows, e.g. after
+    a schema change or when a filter value no longer exists in the data.
+    """
+    failures = []
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        for example in load_examples(examples_path):
+            try:
+                if not conn.execute(example['sql']).fetchmany(1):
+                    failures.append((example, 'the query returns no rows'))
+            except sqlite3.Error as e:
+                failures.append((example, str(e)))
+    finally:
+        conn.close()
+    return failures
+
+
+def format_example(example):
+    return (f"User Query: \"{example['question']}\"\n"
+            f"User precision of the Query: \"{example.get('clarification', '')}\"\n"
+            f"SQL: {example['sql']}")
+
+
+class ExampleRetrievalStats:
+    """
+    In-process counters of how often examples are found, how close they are and how
+    many tokens they add to the prompt.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.top_score_total = 0.0
+        self.examples_injected = 0
+        self.prompt_tokens_added = 0
+        self.budget_cut = 0
+        self.generations = 0
+        self.reused_sql = 0
+
+    def record_lookup(self, top_score, injected, tokens, cut):
+        with self.lock:
+            self.lookups += 1
+            if injected:
+                self.hits += 1
+                self.top_score_total += top_score
+            self.examples_injected += injected
+            self.prompt_tokens_added += tokens
+            self.budget_cut += cut
+
+    def record_generation(self, examples, generated_sql):
+        """
+        Counts generated queries identical to one of the injected examples, a sign the
+        question was a repeat of a verified pattern.
+        """
+        with self.lock:
+            self.generations += 1
+            if any(normalize_sql(example['sql']) == normalize_sql(generated_sql) for example in examples):
+                self.reused_sql += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'lookups': self.lookups,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'mean_top_score': self.top_score_total / self.hits if self.hits else 0.0,
+                'examples_injected': self.examples_injected,
+                'mean_prompt_tokens_added': self.prompt_tokens_added / self.lookups if self.lookups else 0.0,
+                'examples_cut_by_budget': self.budget_cut,
+                'sql_reuse_rate': self.reused_sql / self.generations if self.generations else 0.0,
+            }
+
+
+def normalize_sql(sql):
+    return ' '.join(sql.strip().rstrip(';').lower().split())
+
+
+_index = None
+_index_lock = threading.Lock()
+_stats = ExampleRetrievalStats()
+
+
+def get_example_index():
+    """
+    Returns the process-wide index, loaded on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_index()
+    return _index
+
+
+def reset_example_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def get_retrieval_stats():
+    return _stats
+
+
+def select_examples(question, clarification='', k=TOP_K, token_budget=TOKEN_BUDGET, index=None):
+    """
+    Returns (examples, prompt block) with the k best examples above MIN_SCORE that fit in
+    token_budget. The prompt block is empty when no example is close enough.
+    """
+    index = index or get_example_index()
+    matches = [(score, example) for score, example in index.search(f'{question} {clarification}', k)
+               if score >= MIN_SCORE]
+
+    selected, blocks, tokens = [], [], 0
+    for score, example in matches:
+        block = format_example(example)
+        block_tokens = estimate_tokens(block)
+        if tokens + block_tokens > token_budget:
+            break
+        selected.append(example)
+        blocks.append(block)
+        tokens += block_tokens
+
+    _stats.record_lookup(matches[0][0] if matches else 0.0, len(selected), tokens, len(matches) - len(selected))
+    if not selected:
+        return [], ''
+    return selected, '\n\n'.join(blocks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the verified question -> SQL examples.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help='rebuild the index')
+    search = commands.add_parser('search', help='show the examples selected for a question')
+    search.add_argument('question')
+    search.add_argument('--clarification', default='')
+    check = commands.add_parser('check', help='run every example against a SQLite database')
+    check.add_argument('db_path')
+    add = commands.add_parser('add', help='append a verified example')
+    add.add_argument('--question', required=True)
+    add.add_argument('--clarification', default='')
+    add.add_argument('--sql', required=True)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(f"Indexed {len(build_index().examples)} examples into '{INDEX_PATH}'.")
+    elif args.command == 'search':
+        for score, example in get_example_index().search(f'{args.question} {args.clarification}'):
+            print(f"{score:6.2f}  {example['question']}\n        {example['sql']}")
+        examples, block = select_examples(args.question, args.clarification)
+        print(f"\n{len(examples)} example(s) injected, about {estimate_tokens(block) if block else 0} tokens.")
+    elif args.command == 'check':
+        failures = check_examples(args.db_path)
+        for example, error in failures:
+            print(f"FAILED: {example['question']}: {error}")
+        print(f"{len(failures)} failing example(s).")
+        raise SystemExit(1 if failures else 0)
+    elif args.command == 'add':
+        add_example(args.question, args.clarification, args.sql)
+        print('Example added.')
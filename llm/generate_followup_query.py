@@ -0,0 +1,43 @@
+from .client import get_genai
+from .llm_scheduler import PRIORITY_SQL, estimate_tokens, get_scheduler
+
+# Returned by the model when the follow-up needs data that is not in the previous result.
+NEEDS_FULL_QUERY = "NEEDS_FULL_QUERY"
+
+def generate_followup_query(followUpPrompt, previousPrompt, tableName, tableColumns):
+    """
+    Calls Gemini API to generate a DuckDB SELECT query answering a follow-up question
+    over the previous result only, or NEEDS_FULL_QUERY if that result is not enough.
+
+    tableColumns is a list of (column name, column type) pairs.
+    """
+    columns = "\n  ".join(f"{name} ({col_type})" for name, col_type in tableColumns)
+
+    prompt = f"""
+You are an expert in SQL query generation. The user already received a table answering a previous question and now asks a follow-up about that table.
+Generate a valid DuckDB SELECT query over this single table.
+
+Table {tableName}:
+  {columns}
+
+Previous user query:
+\"{previousPrompt}\"
+
+Follow-up query:
+\"{followUpPrompt}\"
+
+Use only the table {tableName} and the columns listed above.
+If the follow-up cannot be answered with these columns alone (it needs other data, other rows or other tables), return exactly {NEEDS_FULL_QUERY}.
+Always use LOWER(column) = LOWER(value) for text comparisons to ensure case-insensitive behavior.
+Return just the PURE QUERY, no markdown formating!
+"""
+
+    model = get_genai().GenerativeModel("gemini-2.5-pro-preview-06-05")
+    response = get_scheduler().submit(
+        ("gemini-2.5-pro-preview-06-05", prompt),
+        lambda: model.generate_content(prompt),
+        priority=PRIORITY_SQL,
+        estimated_tokens=estimate_tokens(prompt),
+    )
+
+    return response.text.strip()
@@ -1,12 +1,8 @@
-import os
-
-from dotenv import load_dotenv
-load_dotenv()
-
-import google.generativeai as genai
+from .client import get_genai
+from .example_store import get_retrieval_stats, select_examples
+from .llm_scheduler import PRIORITY_SQL, estimate_tokens, get_scheduler
 # from . import build_schema_description
 from .build_schema_description import build_schema_description
-import json
 
 # TODO: write script to pull data from db directly
 # import sqlite3
@@ -19,8 +15,6 @@ import json
 # conn.close()
 
 
-API_KEY = os.environ.get('GEMINI_API_KEY')  # Returns None if not set
-
 def generate_sql_select_query(userPrompt,precisionQ, userPrecision, databaseContext):
     """
     Calls Gemini API to generate an SQLite SELECT query based on userPrompt and databaseContext.
@@ -29,13 +23,22 @@ def generate_sql_select_query(userPrompt,precisionQ, userPrecision, databaseCont
     print("I am about to go to build_schema_description")
     dbContext = build_schema_description(databaseContext)
 
+    # Verified queries of similar questions, as few-shot examples (none if nothing is close enough)
+    examples, examplesBlock = select_examples(userPrompt, userPrecision)
+    examplesSection = ""
+    if examplesBlock:
+        examplesSection = f"""
+Verified examples of similar requests and their correct query (reuse their patterns, adapt them to the request):
+{examplesBlock}
+"""
+
     # Compose the prompt for Gemini
     prompt = f"""
 You are an expert in SQL query generation. Generate a valid SQLite SELECT query for the following request.
 
 Database Schema:
 {dbContext}
-
+{examplesSection}
 User Query:
 \"{userPrompt}\"
 
@@ -51,9 +54,15 @@ Return just the PURE QUERY, no markdown formating!
 """
     
     # Configure Gemini API
-    genai.configure(api_key=API_KEY)
     print("I am about to go to gemini")
-    model = genai.GenerativeModel("gemini-2.5-pro-preview-06-05")
-    response = model.generate_content(prompt)
+    model = get_genai().GenerativeModel("gemini-2.5-pro-preview-06-05")
+    response = get_scheduler().submit(
+        ("gemini-2.5-pro-preview-06-05", prompt),
+        lambda: model.generate_content(prompt),
+        priority=PRIORITY_SQL,
+        estimated_tokens=estimate_tokens(prompt),
+    )
 
-    return response.text.strip()
+    sql = response.text.strip()
+    get_retrieval_stats().record_generation(examples, sql)
+    return sql
@@ -0,0 +1,209 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+# Priority classes, lower runs first.
+PRIORITY_CLARIFICATION = 0
+PRIORITY_SQL = 1
+PRIORITY_SUMMARY = 2
+
+REQUESTS_PER_MINUTE = int(os.environ.get('LLM_REQUESTS_PER_MINUTE', '60'))
+TOKENS_PER_MINUTE = int(os.environ.get('LLM_TOKENS_PER_MINUTE', '1000000'))
+MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '3'))
+
+# Exception class names (google.api_core and HTTP clients) worth retrying.
+RETRYABLE_ERROR_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'GatewayTimeout', 'Aborted', 'TimeoutError', 'ConnectionError',
+}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMSchedulerError(Exception):
+    """Raised when an LLM call failed after its retries or with a non-retryable error."""
+
+
+def is_retryable(error):
+    """
+    Tells whether an LLM call error is transient (rate limit, overload, timeout).
+    """
+    if any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    return getattr(error, 'code', None) in RETRYABLE_STATUS_CODES
+
+
+def estimate_tokens(prompt):
+    """
+    Rough token count of a prompt (about 4 characters per token).
+    """
+    return max(1, len(prompt) // 4)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding at most capacity tokens.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated_at = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        """
+        Seconds until amount tokens are available (0 if they already are).
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMScheduler:
+    """
+    Central admission point for LLM calls.
+
+    Calls wait in a priority queue until both the request and the token buckets allow
+    them, transient errors are retried with jittered exponential backoff, and identical
+    calls already in flight (same key) share one call instead of firing again.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_retries=MAX_RETRIES, base_backoff_s=1.0, max_backoff_s=30.0,
+                 request_burst=None, token_burst=None):
+        self.requests = TokenBucket(requests_per_minute, request_burst)
+        self.tokens = TokenBucket(tokens_per_minute, token_burst)
+        self.max_retries = max_retries
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+
+        self._condition = threading.Condition()
+        self._queue = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+        self._flights = {}
+        self._stats = {
+            'calls': 0, 'coalesced': 0, 'retries': 0, 'failures': 0, 'admitted': 0,
+            'max_queue_depth': 0, 'total_wait_s': 0.0, 'max_wait_s': 0.0,
+        }
+
+    def submit(self, key, func, priority=PRIORITY_SUMMARY, estimated_tokens=1):
+        """
+        Runs func() under the rate limits and returns its result.
+        Callers submitting the same key while a call is in flight get that call's result.
+        Raises LLMSchedulerError if the call fails.
+        """
+        with self._condition:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['calls'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+        else:
+            try:
+                flight.result = self._run_with_retries(func, priority, estimated_tokens)
+            except LLMSchedulerError as e:
+                flight.error = e
+            finally:
+                with self._condition:
+                    del self._flights[key]
+                flight.done.set()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self):
+        """
+        Returns counters, the current queue depth and wait times.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats['queue_depth'] = len(self._queue)
+            stats['in_flight'] = len(self._flights)
+        stats['mean_wait_s'] = stats['total_wait_s'] / stats['admitted'] if stats['admitted'] else 0.0
+        return stats
+
+    def _run_with_retries(self, func, priority, estimated_tokens):
+        attempt = 0
+        while True:
+            self._admit(priority, estimated_tokens)
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self._condition:
+                        self._stats['failures'] += 1
+                    raise LLMSchedulerError(f"LLM call failed after {attempt + 1} attempt(s): {e}") from e
+                attempt += 1
+                with self._condition:
+                    self._stats['retries'] += 1
+                # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+                time.sleep(random.uniform(0, min(self.max_backoff_s, self.base_backoff_s * 2 ** attempt)))
+
+    def _admit(self, priority, estimated_tokens):
+        """
+        Blocks until this call is the highest priority waiting call and both buckets allow it.
+        """
+        ticket = (priority, next(self._sequence))
+        queued_at = time.monotonic()
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], len(self._queue))
+            while True:
+                if self._queue[0] == ticket:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+                    if wait == 0:
+                        break
+                    self._condition.wait(timeout=wait)
+                else:
+                    self._condition.wait()
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+            waited = time.monotonic() - queued_at
+            self._stats['admitted'] += 1
+            self._stats['total_wait_s'] += waited
+            self._stats['max_wait_s'] = max(self._stats['max_wait_s'], waited)
+            self._condition.notify_all()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Returns the process-wide scheduler shared by every LLM call.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
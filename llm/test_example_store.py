@@ -0,0 +1,85 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from llm import example_store
+from llm.example_store import ExampleIndex, load_index, select_examples, tokenize
+
+EXAMPLES = [
+    {"question": "How many petitions are there by status?", "clarification": "All petitions.",
+     "sql": "SELECT STATUS, COUNT(*) FROM petition GROUP BY STATUS;"},
+    {"question": "Which deputies attended the most public sessions?", "clarification": "Count presences per deputy.",
+     "sql": "SELECT NAME, COUNT(*) FROM presence_seance_publique GROUP BY NAME;"},
+    {"question": "List the bills currently in committee", "clarification": "Projets de loi in committee.",
+     "sql": "SELECT Dossier FROM etat_travaux WHERE LOWER(Etat) = LOWER('COMM');"},
+]
+
+
+@pytest.fixture
+def examples_path(tmp_path):
+    path = tmp_path / "examples.jsonl"
+    path.write_text("".join(json.dumps(example) + "\n" for example in EXAMPLES), encoding="utf-8")
+    return path
+
+
+def test_tokenize_folds_accents_plurals_and_stopwords():
+    assert tokenize("Combien de Pétitions par statut?") == ["petition", "par", "statut"]
+
+
+def test_search_ranks_the_closest_question_first():
+    results = ExampleIndex.build(EXAMPLES).search("number of petitions per status", k=2)
+    assert results[0][1] is EXAMPLES[0]
+    assert ExampleIndex.build(EXAMPLES).search("weather forecast") == []
+
+
+def test_index_is_saved_and_rebuilt_when_examples_change(examples_path, tmp_path):
+    index_path = tmp_path / "index.json"
+    load_index(examples_path, index_path)
+    assert json.loads(index_path.read_text(encoding="utf-8"))["doc_lengths"]
+
+    example_store.add_example("Withdrawn law proposals", "", "SELECT 1;", examples_path)
+    assert len(load_index(examples_path, index_path).examples) == 4
+
+
+def test_select_examples_respects_score_and_token_budget():
+    index = ExampleIndex.build(EXAMPLES)
+    examples, block = select_examples("How many petitions by status", index=index)
+    assert examples == [EXAMPLES[0]]
+    assert "GROUP BY STATUS" in block
+
+    assert select_examples("How many petitions by status", index=index, token_budget=5) == ([], "")
+    assert select_examples("weather forecast", index=index) == ([], "")
+
+
+def test_prompt_includes_selected_examples():
+    from llm import generate_sql_select_query as module
+
+    index = ExampleIndex.build(EXAMPLES)
+    scheduler = MagicMock()
+    scheduler.submit.side_effect = lambda key, func, **kwargs: MagicMock(text=EXAMPLES[0]["sql"])
+    with patch.object(example_store, "_index", index), \
+            patch.object(module, "get_genai"), patch.object(module, "get_scheduler", return_value=scheduler):
+        sql = module.generate_sql_select_query("Petitions by status", "", "All petitions", {"tables": []})
+
+    prompt = scheduler.submit.call_args[0][0][1]
+    assert EXAMPLES[0]["sql"] in prompt
+    assert EXAMPLES[1]["sql"] not in prompt
+    assert sql == EXAMPLES[0]["sql"]
+
+
+def test_check_examples_flags_errors_and_empty_results(examples_path, tmp_path):
+    import sqlite3
+
+    db_path = tmp_path / "001_sqlite.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE petition (STATUS TEXT)")
+    conn.execute("CREATE TABLE presence_seance_publique (NAME TEXT)")
+    conn.execute("INSERT INTO petition VALUES ('CLOTUREE')")
+    conn.commit()
+    conn.close()
+
+    failures = {example["question"]: error for example, error in example_store.check_examples(db_path, examples_path)}
+    assert set(failures) == {EXAMPLES[1]["question"], EXAMPLES[2]["question"]}
+    assert failures[EXAMPLES[1]["question"]] == "the query returns no rows"
+    assert "no such table" in failures[EXAMPLES[2]["question"]]
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from llm.llm_scheduler import (
+    PRIORITY_CLARIFICATION,
+    PRIORITY_SUMMARY,
+    LLMScheduler,
+    LLMSchedulerError,
+    TokenBucket,
+)
+
+
+class ResourceExhausted(Exception):
+    """Stands in for google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+
+
+def test_token_bucket_wait_time():
+    now = [0.0]
+    bucket = TokenBucket(rate_per_minute=60, capacity=2, clock=lambda: now[0])
+    assert bucket.wait_time(1) == 0
+    bucket.take(2)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] = 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+
+
+def test_identical_in_flight_calls_are_coalesced():
+    scheduler = LLMScheduler(requests_per_minute=6000)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return "SELECT 1"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(scheduler.submit("prompt", slow_call)))
+    leader.start()
+    started.wait(timeout=5)
+    follower = threading.Thread(target=lambda: results.append(scheduler.submit("prompt", slow_call)))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert results == ["SELECT 1", "SELECT 1"]
+    assert len(calls) == 1
+    assert scheduler.stats()["coalesced"] == 1
+
+
+def test_retryable_errors_are_retried():
+    scheduler = LLMScheduler(requests_per_minute=6000, base_backoff_s=0.001)
+    attempts = []
+
+    def flaky_call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ResourceExhausted("429 quota exceeded")
+        return "ok"
+
+    assert scheduler.submit("prompt", flaky_call) == "ok"
+    assert scheduler.stats()["retries"] == 2
+
+
+def test_non_retryable_errors_fail_immediately():
+    scheduler = LLMScheduler(requests_per_minute=6000, base_backoff_s=0.001)
+    attempts = []
+
+    def bad_call():
+        attempts.append(1)
+        raise ValueError("invalid prompt")
+
+    with pytest.raises(LLMSchedulerError):
+        scheduler.submit("prompt", bad_call)
+    assert len(attempts) == 1
+
+
+def test_higher_priority_calls_go_first():
+    # 10 requests per second, no burst: every call after the first waits for a refill
+    scheduler = LLMScheduler(requests_per_minute=600, request_burst=1)
+    order = []
+    scheduler.submit("warm-up", lambda: None)
+
+    summary = threading.Thread(target=lambda: scheduler.submit(
+        "summary", lambda: order.append("summary"), priority=PRIORITY_SUMMARY))
+    summary.start()
+    time.sleep(0.02)
+    clarification = threading.Thread(target=lambda: scheduler.submit(
+        "clarification", lambda: order.append("clarification"), priority=PRIORITY_CLARIFICATION))
+    clarification.start()
+    summary.join()
+    clarification.join()
+
+    assert order == ["clarification", "summary"]
+    assert scheduler.stats()["max_queue_depth"] == 2
@@ -0,0 +1,263 @@
+# result_export.py
+# Streams the result of a validated SELECT query to CSV, Parquet or Arrow IPC without
+# building the whole result in memory: rows are read with fetchmany and every batch is
+# encoded and handed out as soon as it is read.
+
+from __future__ import annotations
+import argparse
+import csv
+import io
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+
+import pyarrow as pa
+
+from db_utils import DEFAULT_DB_NAME, get_db_path
+
+EXPORT_BATCH_ROWS = 10_000
+# Time limit of exports started from the UI or the API, in seconds (the CLI has none by default)
+EXPORT_TIMEOUT_S = 300.0
+# SQLite virtual machine instructions between two deadline checks
+PROGRESS_CHECK_INSTRUCTIONS = 10_000
+
+EXPORT_FORMATS = {
+    # format: (file extension, MIME type)
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.stream"),
+}
+
+
+class ExportError(ValueError):
+    """Raised when a query cannot be exported (not a single SELECT, type change mid-stream...)."""
+
+
+def validate_select_sql(sql: str) -> str:
+    """
+    Checks that sql is a single SELECT (or WITH ... SELECT) statement and returns it
+    without its trailing semicolons. Raises ExportError otherwise.
+    """
+    statement = sql.strip().rstrip(";").strip()
+    if not statement:
+        raise ExportError("The query is empty.")
+    if statement.split(None, 1)[0].lower() not in ("select", "with"):
+        raise ExportError("Only SELECT queries can be exported.")
+    # A semicolon that closes a complete statement before the end means several statements
+    for position, char in enumerate(statement):
+        if char == ";" and sqlite3.complete_statement(statement[:position + 1]):
+            raise ExportError("Only a single statement can be exported.")
+    return statement
+
+
+def open_read_only_connection(db_name: str = DEFAULT_DB_NAME) -> sqlite3.Connection:
+    """
+    Opens a dedicated read-only connection, so a long export neither holds the shared
+    cached connection nor can modify the database.
+    """
+    return sqlite3.connect(f"file:{get_db_path(db_name)}?mode=ro", uri=True, check_same_thread=False)
+
+
+def iter_query_batches(sql: str, batch_rows: int = EXPORT_BATCH_ROWS, db_name: str = DEFAULT_DB_NAME,
+                       timeout_s: float | None = None) -> Iterator[tuple[list[str], list[tuple]]]:
+    """
+    Runs a validated SELECT query and yields (column names, rows) for every batch of at
+    most batch_rows rows. Yields a single empty batch when the query returns no rows, so
+    writers can still emit a header or schema.
+    With timeout_s, SQLite interrupts the query once that many seconds have passed since
+    the start, including time spent waiting for the consumer, and ExportError is raised.
+    """
+    statement = validate_select_sql(sql)
+    conn = open_read_only_connection(db_name)
+    if timeout_s is not None:
+        deadline = time.monotonic() + timeout_s
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_CHECK_INSTRUCTIONS)
+    try:
+        cursor = conn.execute(statement)
+        columns = [desc[0] for desc in cursor.description]
+        first = True
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows and not first:
+                break
+            yield columns, rows
+            first = False
+            if not rows:
+                break
+    except sqlite3.OperationalError as e:
+        if timeout_s is not None and time.monotonic() > deadline:
+            raise ExportError(f"The export took longer than {timeout_s:g}s and was stopped.") from e
+        raise
+    finally:
+        conn.close()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object collecting what a writer produced since the last drain().
+    """
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError)
+
+
+def _infer_schema(columns: list[str], rows: list[tuple]) -> pa.Schema:
+    """
+    Infers the Arrow schema from the first batch; columns without any value are strings.
+    Integer columns become doubles when floats also appear in the batch.
+    """
+    fields = []
+    for index, name in enumerate(columns):
+        try:
+            array_type = pa.array([row[index] for row in rows]).type if rows else pa.null()
+        except _ARROW_ERRORS as e:
+            raise ExportError(f"Column '{name}' mixes value types ({e}), export it as CSV instead.") from e
+        fields.append(pa.field(name, pa.string() if pa.types.is_null(array_type) else array_type))
+    return pa.schema(fields)
+
+
+def _to_record_batch(schema: pa.Schema, rows: list[tuple]) -> pa.RecordBatch:
+    """
+    Converts a batch to the schema of the first one. Values are converted with their own
+    type and then cast safely, so a later float in an integer column is an error rather
+    than silently truncated.
+    """
+    arrays = []
+    for index, field in enumerate(schema):
+        values = [row[index] for row in rows]
+        if pa.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        try:
+            arrays.append(pa.array(values).cast(field.type, safe=True))
+        except _ARROW_ERRORS as e:
+            raise ExportError(f"Column '{field.name}' changes type during the export ({e}), "
+                              f"export it as CSV instead.") from e
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def iter_csv(batches) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for columns, rows in batches:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def iter_arrow(batches) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    writer = None
+    for columns, rows in batches:
+        if writer is None:
+            schema = _infer_schema(columns, rows)
+            writer = pa.ipc.new_stream(sink, schema)
+        if rows:
+            writer.write_batch(_to_record_batch(schema, rows))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def iter_parquet(batches) -> Iterator[bytes]:
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    writer = None
+    for columns, rows in batches:
+        if writer is None:
+            schema = _infer_schema(columns, rows)
+            writer = pq.ParquetWriter(sink, schema)
+        if rows:
+            # Every batch becomes one row group, flushed to the sink when written
+            writer.write_batch(_to_record_batch(schema, rows))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+_ENCODERS = {"csv": iter_csv, "parquet": iter_parquet, "arrow": iter_arrow}
+
+
+def stream_export(sql: str, export_format: str, batch_rows: int = EXPORT_BATCH_ROWS,
+                  db_name: str = DEFAULT_DB_NAME, timeout_s: float | None = None) -> Iterator[bytes]:
+    """
+    Yields the encoded export of a query chunk by chunk. The query is validated before
+    the first chunk is produced, so invalid queries fail before anything is sent.
+    """
+    if export_format not in _ENCODERS:
+        raise ExportError(f"Unknown export format '{export_format}', expected one of {', '.join(_ENCODERS)}.")
+    validate_select_sql(sql)
+    for chunk in _ENCODERS[export_format](iter_query_batches(sql, batch_rows, db_name, timeout_s)):
+        if chunk:
+            yield chunk
+
+
+def export_to_file(sql: str, export_format: str, path: str, batch_rows: int = EXPORT_BATCH_ROWS,
+                   db_name: str = DEFAULT_DB_NAME, timeout_s: float | None = None) -> int:
+    """
+    Streams an export into a file and returns the number of bytes written.
+    """
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in stream_export(sql, export_format, batch_rows, db_name, timeout_s):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the result of a SELECT query.")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--sql", help="SELECT query to export")
+    query.add_argument("--sql-file", help="file containing the SELECT query")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+    parser.add_argument("-o", "--output", help="output file, defaults to standard output")
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    parser.add_argument("--db", default=DEFAULT_DB_NAME)
+    parser.add_argument("--timeout", type=float, default=None, help="stop the export after this many seconds")
+    args = parser.parse_args()
+
+    sql = args.sql
+    if args.sql_file:
+        with open(args.sql_file, encoding="utf-8") as f:
+            sql = f.read()
+
+    try:
+        if args.output:
+            size = export_to_file(sql, args.format, args.output, args.batch_rows, args.db, args.timeout)
+            print(f"Exported {size} bytes to '{args.output}'.", file=sys.stderr)
+        else:
+            for chunk in stream_export(sql, args.format, args.batch_rows, args.db, args.timeout):
+                sys.stdout.buffer.write(chunk)
+    except (ExportError, sqlite3.Error) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,240 @@
+# result_store.py
+
+from __future__ import annotations
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+
+# Number of rows kept in the chat history itself for every result.
+PREVIEW_ROWS = 5
+# Results kept per session; older ones are evicted and can no longer be expanded.
+MAX_RESULTS_PER_SESSION = 20
+# Bytes of Arrow data kept in memory for the whole process before spilling to disk.
+MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+# Bytes of spilled Arrow data kept on disk for the whole process.
+DISK_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def _ipc_write_options() -> pa.ipc.IpcWriteOptions:
+    """
+    Returns IPC options with zstd compression when this pyarrow build supports it.
+    """
+    if pa.Codec.is_available("zstd"):
+        return pa.ipc.IpcWriteOptions(compression="zstd")
+    return pa.ipc.IpcWriteOptions()
+
+
+def _stringify_object_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a copy of df where object columns hold strings (nulls kept), for columns that
+    mix value types, e.g. SQLite results of COALESCE or UNION over different types.
+    """
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        df[column] = [None if pd.api.types.is_scalar(value) and pd.isna(value) else str(value) for value in df[column]]
+    return df
+
+
+def dataframe_to_ipc(df: pd.DataFrame) -> bytes:
+    """
+    Serializes a DataFrame to Arrow IPC stream bytes. Object columns that Arrow cannot
+    type because they mix values of several types are stored as strings.
+    """
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        table = pa.Table.from_pandas(_stringify_object_columns(df), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=_ipc_write_options()) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_dataframe(data: bytes) -> pd.DataFrame:
+    """
+    Deserializes Arrow IPC stream bytes written by dataframe_to_ipc.
+    """
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+class ResultStore:
+    """
+    Process-wide store for query results referenced from the chat history.
+
+    Results are kept as Arrow IPC bytes. Each session keeps at most
+    max_results_per_session results (least recently used are dropped), and when the
+    in-memory total exceeds memory_budget_bytes the least recently used results of the
+    whole process are spilled to disk, where disk_budget_bytes bounds them in turn.
+    """
+
+    def __init__(
+        self,
+        max_results_per_session: int = MAX_RESULTS_PER_SESSION,
+        memory_budget_bytes: int = MEMORY_BUDGET_BYTES,
+        disk_budget_bytes: int = DISK_BUDGET_BYTES,
+        spill_dir: str | None = None,
+    ):
+        self.max_results_per_session = max_results_per_session
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self._own_spill_dir = spill_dir is None
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="askmychambre_results_")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        if self._own_spill_dir:
+            atexit.register(self.close) # Do not leave the spill directory behind
+
+        self._lock = threading.Lock()
+        # result_id -> {"session": str, "size": int, "data": bytes | None, "path": str | None}
+        # Ordered from least to most recently used.
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._sessions: dict[str, OrderedDict[str, None]] = {}
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+
+    def put(self, session_id: str, df: pd.DataFrame) -> str:
+        """
+        Stores a result for a session and returns its id.
+        """
+        data = dataframe_to_ipc(df)
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[result_id] = {"session": session_id, "size": len(data), "data": data, "path": None}
+            self.memory_bytes += len(data)
+            session = self._sessions.setdefault(session_id, OrderedDict())
+            session[result_id] = None
+            while len(session) > self.max_results_per_session:
+                oldest_id, _ = session.popitem(last=False)
+                self._remove(oldest_id)
+            self._enforce_budgets()
+        return result_id
+
+    def get(self, result_id: str) -> pd.DataFrame | None:
+        """
+        Returns a stored result, or None if it has been evicted.
+        """
+        data = self._read(result_id)
+        return ipc_to_dataframe(data) if data is not None else None
+
+    def get_arrow(self, result_id: str) -> pa.Table | None:
+        """
+        Returns a stored result as an Arrow table, or None if it has been evicted.
+        """
+        data = self._read(result_id)
+        return pa.ipc.open_stream(data).read_all() if data is not None else None
+
+    def _read(self, result_id: str) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(result_id)
+            self._sessions[entry["session"]].move_to_end(result_id)
+            data = entry["data"]
+            path = entry["path"]
+        if data is None:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+        return data
+
+    def drop_session(self, session_id: str) -> None:
+        """
+        Removes every result of a session, e.g. when the user starts a new search.
+        """
+        with self._lock:
+            for result_id in self._sessions.pop(session_id, {}):
+                self._remove(result_id, from_session=False)
+
+    def close(self) -> None:
+        """
+        Drops every result and removes the spill directory if the store created it.
+        """
+        with self._lock:
+            for result_id in list(self._entries):
+                self._remove(result_id)
+        if self._own_spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "results": len(self._entries),
+                "sessions": len(self._sessions),
+                "memory_bytes": self.memory_bytes,
+                "disk_bytes": self.disk_bytes,
+            }
+
+    # --- internals, called with the lock held ---
+
+    def _remove(self, result_id: str, from_session: bool = True) -> None:
+        entry = self._entries.pop(result_id, None)
+        if entry is None:
+            return
+        if from_session:
+            session = self._sessions.get(entry["session"])
+            if session is not None:
+                session.pop(result_id, None)
+                if not session:
+                    del self._sessions[entry["session"]]
+        if entry["data"] is not None:
+            self.memory_bytes -= entry["size"]
+        else:
+            self.disk_bytes -= entry["size"]
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+
+    def _enforce_budgets(self) -> None:
+        for result_id, entry in list(self._entries.items()):
+            if self.memory_bytes <= self.memory_budget_bytes:
+                break
+            if entry["data"] is None:
+                continue
+            path = os.path.join(self.spill_dir, f"{result_id}.arrow")
+            try:
+                with open(path, "wb") as f:
+                    f.write(entry["data"])
+            except OSError as e:
+                print(f"Could not spill result {result_id} to disk, dropping it: {e}")
+                self._remove(result_id)
+                continue
+            entry["data"] = None
+            entry["path"] = path
+            self.memory_bytes -= entry["size"]
+            self.disk_bytes += entry["size"]
+
+        for result_id, entry in list(self._entries.items()):
+            if self.disk_bytes <= self.disk_budget_bytes:
+                break
+            if entry["data"] is None:
+                self._remove(result_id)
+
+
+def make_history_result(store: ResultStore, session_id: str, df: pd.DataFrame | None) -> dict | None:
+    """
+    Stores a result and returns the compact entry kept in the chat history:
+    the result id, its size, its columns and a preview of its first rows.
+    """
+    if df is None:
+        return None
+    try:
+        result_id = store.put(session_id, df)
+    except Exception as e: # The answer is still shown, with its preview only
+        print(f"Could not store the result, keeping its preview only: {e}")
+        result_id = None
+    return {
+        "id": result_id,
+        "rows": len(df),
+        "columns": list(df.columns),
+        "preview": df.head(PREVIEW_ROWS).copy(),
+    }
@@ -1,24 +1,47 @@
 # services.py
 
 from __future__ import annotations
-import pandas as pd
-import google.generativeai as genai
 import os
+import threading
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 import json # <--- Add this import
 
 # Import database utility functions
-from db_utils import fetch_query
+from db_utils import fetch_query, get_db_generation, run_select
+from llm.client import API_KEY as GEMINI_API_KEY, get_genai
+from llm.llm_scheduler import (
+    PRIORITY_CLARIFICATION,
+    PRIORITY_SUMMARY,
+    estimate_tokens,
+    get_scheduler,
+)
 
 # Load environment variables for Gemini
 load_dotenv()
-GEMINI_API_KEY = os.getenv("API_KEY")
 MODEL_NAME_FROM_ENV = os.getenv("MODEL_NAME")
 
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
-    print("WARNING: GEMINI_API_KEY not found in .env. Gemini calls will fail.")
+# The key is read by llm.client (API_KEY or GEMINI_API_KEY), like for the llm package
+if not GEMINI_API_KEY:
+    print("WARNING: API_KEY / GEMINI_API_KEY not found in .env. Gemini calls will fail.")
+
+# pandas, pyarrow and the Gemini client are imported on first use (see startup.warm_up)
+# so that importing services stays cheap.
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+# Schema catalog read from 'table_metadata', per output type, for one database generation
+_schema_cache: dict[str, str | dict] = {}
+_schema_cache_generation: int | None = None
+_schema_cache_lock = threading.Lock()
+
+def clear_schema_cache() -> None:
+    """
+    Drops the cached schema catalog.
+    """
+    with _schema_cache_lock:
+        _schema_cache.clear()
 
 # --- New Function to Get and Format Schema Information ---
 def get_schema_info_from_db(output_type: str = "str") -> str:
@@ -31,10 +54,29 @@ def get_schema_info_from_db(output_type: str = "str") -> str:
 
     Returns:
         str: Formatted schema information.
+
+    The result is cached per output type until the database is rebuilt (see
+    db_utils.get_db_generation) or clear_schema_cache() is called.
     """
+    global _schema_cache_generation
+    generation = get_db_generation()
+    with _schema_cache_lock:
+        if generation != _schema_cache_generation:
+            _schema_cache.clear()
+            _schema_cache_generation = generation
+        if output_type in _schema_cache:
+            return _schema_cache[output_type]
     # fetch_query returns a tuple: (actual_row_data_list, column_names_list)
     # Unpack the tuple correctly:
     actual_rows_data, _ = fetch_query("SELECT * FROM table_metadata;") # We don't need column_names_list here as row.keys() will be used
+    schema_info = _format_schema_info(actual_rows_data, output_type)
+    if actual_rows_data: # Do not cache the fallback text of a failed or empty read
+        with _schema_cache_lock:
+            if generation == _schema_cache_generation: # Unless a newer generation took over meanwhile
+                _schema_cache[output_type] = schema_info
+    return schema_info
+
+def _format_schema_info(actual_rows_data: list, output_type: str) -> str:
 
     if not actual_rows_data: # Check if the list of actual row data is empty
         if output_type == "json":
@@ -72,23 +114,31 @@ def get_schema_info_from_db(output_type: str = "str") -> str:
 
 # --- Existing functions (get_gemini_completion, clarify, process_user_query) ---
 
-def get_gemini_completion(prompt: str, model_name: str | None = None) -> str | None:
+def get_gemini_completion(prompt: str, model_name: str | None = None, priority: int = PRIORITY_SUMMARY) -> str | None:
     """
     Sends a prompt to the specified Gemini model and returns the text completion.
+    The call goes through the shared LLM scheduler (rate limits, retries, coalescing of
+    identical prompts). Returns None if the call failed or returned no content, so callers
+    can fall back to their own message instead of showing an error string to the user.
     """
     current_model_name = model_name if model_name else MODEL_NAME_FROM_ENV
 
     if not GEMINI_API_KEY:
         print("Gemini API Key not configured. Cannot make API call.")
-        return "Error: Gemini API Key not configured."
+        return None
 
     if not current_model_name:
         print("Gemini Model name not specified. Cannot make API call.")
-        return "Error: Gemini Model name not specified."
+        return None
         
     try:
-        model = genai.GenerativeModel(current_model_name)
-        response = model.generate_content(prompt)
+        model = get_genai().GenerativeModel(current_model_name)
+        response = get_scheduler().submit(
+            (current_model_name, prompt),
+            lambda: model.generate_content(prompt),
+            priority=priority,
+            estimated_tokens=estimate_tokens(prompt),
+        )
         
         if response.parts:
             return response.text
@@ -96,12 +146,10 @@ def get_gemini_completion(prompt: str, model_name: str | None = None) -> str | N
             print("Warning: Gemini received an empty response or content was blocked.")
             if hasattr(response, 'prompt_feedback') and response.prompt_feedback:
                 print(f"Prompt feedback: {response.prompt_feedback}")
-                if response.prompt_feedback.block_reason:
-                    return f"Blocked: {response.prompt_feedback.block_reason.name}"
             return None
-    except Exception as e:
+    except Exception as e: # Scheduler errors, and ValueError from blocked responses or the model setup
         print(f"An error occurred during Gemini API call: {e}")
-        return f"Error during Gemini API call: {str(e)}"
+        return None
 
 def clarify(user_query: str) -> str:
     """
@@ -126,7 +174,7 @@ def clarify(user_query: str) -> str:
         "Give the user enough context to choose from (including examples and SQL variables), because you have only one chance to ask for precisions."
     )
 
-    completion = get_gemini_completion(prompt)
+    completion = get_gemini_completion(prompt, priority=PRIORITY_CLARIFICATION)
     
     if completion:
         return completion
@@ -135,20 +183,15 @@ def clarify(user_query: str) -> str:
         return ("I'm having a bit of trouble formulating a clarification right now. "
                 "Could you please try rephrasing your query or try again shortly?")
 
-def process_user_query(
+def generate_sql_for_query(
     user_query: str,
     clarification_prompt_from_ai: str,
     user_response_to_clarification: str,
-) -> tuple[str, pd.DataFrame | None]:
+) -> str:
     """
-    Processes the user's full query (initial + clarification response)
-    to fetch data from the database and summarize it.
+    First stage of process_user_query: generates the SQL query for the user's full query
+    (initial + clarification response) from the schema stored in the database.
     """
-    # For demonstration, let's assume the schema (in JSON) might be useful here
-    # or for another LLM call that generates SQL.
-    # schema_json_for_sql_generation = get_schema_info_from_db(output_type="json")
-    # print(f"Schema in JSON for SQL generation (example): {schema_json_for_sql_generation}") # Debugging
-
     from llm.generate_sql_select_query import generate_sql_select_query
 
     print("I am about to go to get_schema_info_from_db function")
@@ -156,12 +199,20 @@ def process_user_query(
     print("I am about to go to generate_sql_select_query function")
     generated_sql_query = generate_sql_select_query(user_query, clarification_prompt_from_ai, user_response_to_clarification,databaseContext)
     print(f"Generated SQL Query: {generated_sql_query}")  # Debugging output
-    # ADD the generate_sql_select_query func here
-    # generated_sql_query = "SELECT * FROM table_metadata LIMIT 3;" # Example
+    return generated_sql_query
+
+def run_generated_sql(generated_sql_query: str) -> tuple[pd.DataFrame | None, str]:
+    """
+    Second stage of process_user_query: runs the generated SQL query against the database.
+    Returns the result table and a one-line summary of it for the summary prompt.
+    Raises sqlite3.Error if the query fails, so callers can report the database error.
+    """
+    import pandas as pd
+
     sql_params = None
 
-    # fetch_query now returns (rows, column_names)
-    query_results_rows, column_names = fetch_query(generated_sql_query, sql_params)
+    # run_select returns (rows, column_names)
+    query_results_rows, column_names = run_select(generated_sql_query, sql_params)
 
     response_table: pd.DataFrame | None = None
     table_summary_for_prompt: str
@@ -177,11 +228,21 @@ def process_user_query(
     elif column_names is not None and not query_results_rows : # Table exists (has columns) but is empty
         table_summary_for_prompt = f"The query executed successfully and the table has columns: {', '.join(column_names)}, but it returned no data."
         response_table = pd.DataFrame([], columns=column_names) # Create empty DataFrame with columns
-    else: # Query failed, returned no rows and no column names (error shown by fetch_query)
+    else: # Statement without a result set
         table_summary_for_prompt = "The query did not return any data or schema from the database."
 
-    # >>>>> provide a pandas table "response_table" and a string "table_summary_for_prompt"
+    return response_table, table_summary_for_prompt
 
+def summarize_query_result(
+    user_query: str,
+    clarification_prompt_from_ai: str,
+    user_response_to_clarification: str,
+    response_table: pd.DataFrame | None,
+    table_summary_for_prompt: str,
+) -> str:
+    """
+    Last stage of process_user_query: writes the user-facing text response for a result.
+    """
     summary_prompt_context = (
         f"Initial user query: '{user_query}'\n"
         f"AI's clarifying question/statement: '{clarification_prompt_from_ai}'\n"
@@ -194,10 +255,79 @@ def process_user_query(
         "Do not repeat the raw inputs extensively."
     )
     
-    text_response = get_gemini_completion(summary_prompt_context)
+    text_response = get_gemini_completion(summary_prompt_context, priority=PRIORITY_SUMMARY)
 
     if not text_response:
         text_response = "I've processed your request. "
         text_response += "Data is displayed below." if response_table is not None and not response_table.empty else "However, no specific data was found for your criteria."
-        
-    return text_response, response_table
\ No newline at end of file
+
+    return text_response
+
+def process_user_query_with_sql(
+    user_query: str,
+    clarification_prompt_from_ai: str,
+    user_response_to_clarification: str,
+) -> tuple[str, pd.DataFrame | None, str]:
+    """
+    Same as process_user_query, but also returns the SQL that produced the table,
+    so the full result can be exported again later (see result_export).
+    """
+    generated_sql_query = generate_sql_for_query(user_query, clarification_prompt_from_ai, user_response_to_clarification)
+    response_table, table_summary_for_prompt = run_generated_sql(generated_sql_query)
+    text_response = summarize_query_result(
+        user_query,
+        clarification_prompt_from_ai,
+        user_response_to_clarification,
+        response_table,
+        table_summary_for_prompt,
+    )
+    return text_response, response_table, generated_sql_query
+
+def process_user_query(
+    user_query: str,
+    clarification_prompt_from_ai: str,
+    user_response_to_clarification: str,
+) -> tuple[str, pd.DataFrame | None]:
+    """
+    Processes the user's full query (initial + clarification response)
+    to fetch data from the database and summarize it.
+    """
+    text_response, response_table, _ = process_user_query_with_sql(
+        user_query, clarification_prompt_from_ai, user_response_to_clarification
+    )
+    return text_response, response_table
+
+def process_follow_up_query(
+    follow_up_query: str,
+    previous_user_query: str,
+    previous_result: pa.Table,
+) -> tuple[str, pd.DataFrame] | None:
+    """
+    Answers a follow-up question over the previous result only, in an embedded DuckDB
+    database, without touching the main database.
+    Returns None when the follow-up needs data outside the previous result, so the caller
+    can fall back to the full pipeline.
+    """
+    import duckdb
+    from followup_engine import RESULT_TABLE_NAME, describe_result_table, run_follow_up_sql
+    from llm.generate_followup_query import NEEDS_FULL_QUERY, generate_followup_query
+
+    generated_sql_query = generate_followup_query(
+        follow_up_query, previous_user_query, RESULT_TABLE_NAME, describe_result_table(previous_result)
+    )
+    print(f"Generated follow-up SQL Query: {generated_sql_query}")  # Debugging output
+    if NEEDS_FULL_QUERY in generated_sql_query:
+        return None
+
+    try:
+        response_table = run_follow_up_sql(generated_sql_query, previous_result)
+    except duckdb.Error as e:
+        print(f"Follow-up query failed on the previous result, falling back: {e}")
+        return None
+
+    if response_table.empty:
+        text_response = "Within the previous result, no rows match your follow-up."
+    else:
+        text_response = (f"Based on the previous result, here's what I found: "
+                         f"{len(response_table)} rows with columns {', '.join(response_table.columns)}.")
+    return text_response, response_table
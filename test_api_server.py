@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("streamlit")
+pd = pytest.importorskip("pandas")
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import api_server
+
+
+@pytest.fixture(autouse=True)
+def no_warm_up(monkeypatch):
+    monkeypatch.setattr(api_server, "warm_up", lambda: None)
+
+
+def call(app, method, path, **kwargs):
+    """Sends one request to app and returns (status, JSON body)."""
+    async def run():
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            response = await client.request(method, path, **kwargs)
+            return response.status, await response.json()
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+def test_health():
+    status, body = call(api_server.create_app(), "GET", "/health")
+    assert status == 200 and body["status"] == "ok"
+
+
+@pytest.mark.parametrize("body", [["x"], {"query": 1}, {}])
+def test_invalid_bodies_are_rejected(body):
+    status, response = call(api_server.create_app(), "POST", "/clarify", json=body)
+    assert status == 400 and "error" in response
+
+
+def test_invalid_json_is_rejected():
+    status, _ = call(api_server.create_app(), "POST", "/clarify", data="{",
+                     headers={"Content-Type": "application/json"})
+    assert status == 400
+
+
+def test_slow_stage_times_out(monkeypatch):
+    monkeypatch.setattr(api_server, "clarify", lambda query: time.sleep(1))
+    status, response = call(api_server.create_app(request_timeout_s=0.1), "POST", "/clarify", json={"query": "q"})
+    assert status == 504 and "error" in response
+
+
+def test_failing_stage_is_a_json_502(monkeypatch):
+    def fail(*args):
+        raise ValueError("no API key")
+    monkeypatch.setattr(api_server, "process_user_query_with_sql", fail)
+    status, response = call(api_server.create_app(), "POST", "/query",
+                            json={"query": "q", "clarification_prompt": "p", "clarification_response": "r"})
+    assert status == 502 and "no API key" not in response["error"]
+
+
+def test_query_returns_table_and_sql(monkeypatch):
+    table = pd.DataFrame({"STATUS": ["CLOTUREE"], "petitions": [3]})
+    monkeypatch.setattr(api_server, "process_user_query_with_sql",
+                        lambda *args: ("Three petitions.", table, "SELECT STATUS, COUNT(*) FROM petition"))
+    status, response = call(api_server.create_app(), "POST", "/query",
+                            json={"query": "q", "clarification_prompt": "p", "clarification_response": "r"})
+    assert status == 200
+    assert response == {"text": "Three petitions.", "sql": "SELECT STATUS, COUNT(*) FROM petition",
+                        "columns": ["STATUS", "petitions"], "rows": [["CLOTUREE", 3]]}
+
+
+def test_failing_sql_is_a_json_502_with_the_database_error(monkeypatch):
+    import sqlite3
+
+    def fail(*args):
+        raise sqlite3.OperationalError("no such column: nope")
+    monkeypatch.setattr(api_server, "process_user_query_with_sql", fail)
+    status, response = call(api_server.create_app(), "POST", "/query",
+                            json={"query": "q", "clarification_prompt": "p", "clarification_response": "r"})
+    assert status == 502
+    assert response == {"error": "The generated SQL query failed.", "detail": "no such column: nope"}
+
+
+def test_exports_have_their_own_slots_and_time_limit(tmp_path, monkeypatch):
+    import sqlite3
+    import result_export
+
+    db_path = tmp_path / "001_sqlite.db"
+    sqlite3.connect(db_path).close()
+    monkeypatch.setattr(result_export, "get_db_path", lambda db_name: str(db_path))
+    monkeypatch.setattr(api_server, "clarify", lambda query: "Which legislature?")
+    slow_query = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) SELECT COUNT(*) FROM n"
+
+    async def run():
+        app = api_server.create_app(request_timeout_s=0.2, max_exports=1, export_timeout_s=0.05)
+        client = TestClient(TestServer(app))
+        await client.start_server()
+        try:
+            response = await client.post("/export", json={"sql": slow_query, "format": "csv"})
+            assert response.status == 400 and "longer than" in (await response.json())["error"]
+
+            await app["export_semaphore"].acquire()  # Every export slot busy
+            response = await client.post("/clarify", json={"query": "attendance"})
+            assert response.status == 200
+            response = await client.post("/export", json={"sql": "SELECT 1", "format": "csv"})
+            assert response.status == 504
+        finally:
+            await client.close()
+    asyncio.run(run())
+
+
+def test_metrics_are_keyed_on_routes():
+    async def run():
+        client = TestClient(TestServer(api_server.create_app()))
+        await client.start_server()
+        try:
+            for path in ("/health", "/nope-1", "/nope-2"):
+                await client.get(path)
+            await client.get("/export")
+            response = await client.get("/metrics")
+            return await response.json()
+        finally:
+            await client.close()
+    endpoints = asyncio.run(run())["endpoints"]
+    assert set(endpoints) == {"/health", api_server.UNMATCHED_ROUTE}
+    unmatched = endpoints[api_server.UNMATCHED_ROUTE]
+    assert unmatched["requests"] == 3 and unmatched["errors"] == 3
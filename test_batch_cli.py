@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("streamlit")
+pd = pytest.importorskip("pandas")
+
+import batch_cli
+
+
+def test_run_batch_with_stubbed_services(tmp_path, monkeypatch):
+    def generate_sql(query, clarification_prompt, clarification_response):
+        if query == "broken":
+            raise RuntimeError("model unavailable")
+        return f"SELECT '{query}'"
+
+    monkeypatch.setattr(batch_cli, "clarify", lambda query: f"clarify {query}")
+    monkeypatch.setattr(batch_cli, "generate_sql_for_query", generate_sql)
+    monkeypatch.setattr(batch_cli, "run_generated_sql",
+                        lambda sql: (pd.DataFrame({"STATUS": ["CLOTUREE", "RETIREE"]}), "2 rows"))
+    monkeypatch.setattr(batch_cli, "summarize_query_result", lambda *args: "Two statuses.")
+
+    questions_path = tmp_path / "questions.jsonl"
+    questions_path.write_text(
+        json.dumps({"id": "q1", "query": "statuses", "clarification_prompt": "Which ones?"}) + "\n\n"
+        + json.dumps({"query": "broken"}) + "\n",
+        encoding="utf-8",
+    )
+    questions = batch_cli.read_questions(str(questions_path))
+    assert [q["id"] for q in questions] == ["q1", "3"]
+
+    output_path = tmp_path / "results.jsonl"
+    failures = asyncio.run(batch_cli.run_batch(questions, str(output_path), 2, 1, str(tmp_path / "tables")))
+
+    results = {r["id"]: r for r in map(json.loads, output_path.read_text(encoding="utf-8").splitlines())}
+    assert failures == 1
+    assert results["q1"]["clarification_prompt"] == "Which ones?"
+    assert results["q1"]["sql"] == "SELECT 'statuses'"
+    assert results["q1"]["rows"] == 2 and results["q1"]["text"] == "Two statuses."
+    assert pd.read_csv(results["q1"]["table_path"])["STATUS"].tolist() == ["CLOTUREE", "RETIREE"]
+    assert results["3"]["clarification_prompt"] == "clarify broken"
+    assert results["3"]["error"] == "RuntimeError: model unavailable"
+
+
+def test_failing_sql_is_recorded_as_an_error(tmp_path, monkeypatch):
+    import sqlite3
+    import db_utils
+    import services
+
+    db_path = tmp_path / "001_sqlite.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE petition (STATUS TEXT)")
+    conn.close()
+    monkeypatch.setattr(db_utils, "get_db_path", lambda db_name: str(db_path))
+    monkeypatch.setattr(db_utils, "_generations", {})
+    monkeypatch.setattr(batch_cli, "generate_sql_for_query", lambda *args: "SELECT nope FROM petition")
+    monkeypatch.setattr(batch_cli, "run_generated_sql", services.run_generated_sql)
+    monkeypatch.setattr(batch_cli, "summarize_query_result", lambda *args: "unused")
+
+    output_path = tmp_path / "results.jsonl"
+    questions = [{"id": "q1", "query": "statuses", "clarification_prompt": "p", "clarification_response": ""}]
+    assert asyncio.run(batch_cli.run_batch(questions, str(output_path), 1, 1)) == 1
+
+    result = json.loads(output_path.read_text(encoding="utf-8"))
+    assert result["sql"] == "SELECT nope FROM petition"
+    assert result["error"] == "OperationalError: no such column: nope"
@@ -0,0 +1,142 @@
+import datetime
+
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from data_processing import clean_headers, load_source_files_as_separate_tables
+
+
+def test_clean_headers():
+    raw = ["﻿Dossier", "Relatif à", "Recev?", "", "Nature", "Nature "]
+    assert clean_headers(raw, {}) == ["Dossier", "Relatif à", "Recev", "column_4", "Nature", "Nature_2"]
+    assert clean_headers(raw, {"header_renames": {"Recev?": "Recevable"}})[2] == "Recevable"
+
+
+def test_load_sources_streams_xlsx_in_batches(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    pytest.importorskip("pandas")
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "ETAT_TRAVAUX"
+    sheet.append(["Dossier", "Nature", "Dépôt", "Recev?", "NbrAut"])
+    for dossier in range(7389, 7389 + 25):
+        sheet.append([dossier, "PL", datetime.datetime(2018, 12, 4), None, 1])
+    workbook.create_sheet("LISTE_COLONNES").append(["Dossier", "N° DU DOSSIER"])
+    workbook.save(tmp_path / "121-etat-travaux.xlsx")
+
+    with open(tmp_path / "121-etat-travaux.csv", "w", encoding="utf-8-sig") as f:
+        f.write("Dossier;Nature\n1;PL\n")
+
+    db_path = str(tmp_path / "000_duck.db")
+    load_source_files_as_separate_tables(
+        str(tmp_path), db_path, batch_size=10,
+        source_configs={"121-etat-travaux.csv": {"skip": True}, "121-etat-travaux.xlsx": {"sheet": "ETAT_TRAVAUX"}},
+    )
+
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        columns = con.execute("DESCRIBE etat_travaux;").fetchall()
+        assert [(c[0], c[1]) for c in columns] == [
+            ("Dossier", "BIGINT"), ("Nature", "VARCHAR"), ("Dépôt", "DATE"), ("Recev", "VARCHAR"), ("NbrAut", "BIGINT"),
+        ]
+        assert con.execute("SELECT COUNT(*), MAX(Dossier) FROM etat_travaux;").fetchone() == (25, 7413)
+        assert [row[0] for row in con.execute("SHOW TABLES;").fetchall()] == ["etat_travaux"]
+    finally:
+        con.close()
+
+
+def test_load_sources_uses_csv_delimiter(tmp_path):
+    with open(tmp_path / "121-etat-travaux.csv", "w", encoding="utf-8-sig") as f:
+        f.write("Dossier;Relatif à;Recev?\n7389;portant approbation, de l'Accord;\n")
+
+    db_path = str(tmp_path / "000_duck.db")
+    load_source_files_as_separate_tables(str(tmp_path), db_path, source_configs={
+        "121-etat-travaux.csv": {"delimiter": ";", "encoding": "utf-8"},
+    })
+
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        assert con.execute('SELECT Dossier, "Relatif à" FROM etat_travaux;').fetchall() == [
+            (7389, "portant approbation, de l'Accord"),
+        ]
+        assert [c[0] for c in con.execute("DESCRIBE etat_travaux;").fetchall()] == ["Dossier", "Relatif à", "Recev"]
+    finally:
+        con.close()
+
+
+def test_finalize_sqlite_sets_page_size_and_statistics(tmp_path):
+    import sqlite3
+    from data_processing import finalize_sqlite
+
+    path = str(tmp_path / "001_sqlite.db")
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE petition (PETITION_NBR INTEGER, STATUS TEXT)")
+    con.execute("CREATE INDEX petition_status ON petition (STATUS)")
+    con.executemany("INSERT INTO petition VALUES (?, ?)", [(i, "CLOTUREE") for i in range(100)])
+    con.commit()
+    con.close()
+
+    finalize_sqlite(path, page_size=8192)
+
+    con = sqlite3.connect(path)
+    try:
+        assert con.execute("PRAGMA page_size;").fetchone()[0] == 8192
+        assert con.execute("SELECT COUNT(*) FROM sqlite_stat1;").fetchone()[0] > 0
+    finally:
+        con.close()
+
+
+def test_failed_build_leaves_current_database_in_place(tmp_path, monkeypatch):
+    import data_processing
+
+    current = tmp_path / "001_sqlite.db"
+    current.write_bytes(b"current database")
+    (tmp_path / "121-etat-travaux.csv").write_text("Dossier;Nature\n7389;PL\n", encoding="utf-8")
+    monkeypatch.setattr(data_processing, "convert_duckdb_to_sqlite", lambda *args: False)
+
+    with pytest.raises(RuntimeError):
+        data_processing.build_database(str(tmp_path), str(tmp_path / "000_duck.db"), str(current),
+                                       source_configs={"121-etat-travaux.csv": {"delimiter": ";"}})
+
+    assert current.read_bytes() == b"current database"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["001_sqlite.db", "121-etat-travaux.csv"]
+
+
+def test_build_takes_table_metadata_from_a_database_that_has_it(tmp_path, monkeypatch):
+    import sqlite3
+    import data_processing
+
+    current = tmp_path / "001_sqlite.db"
+    con = sqlite3.connect(current)
+    con.execute("CREATE TABLE petition (STATUS TEXT)")  # Built earlier without table_metadata
+    con.close()
+    (tmp_path / "121-etat-travaux.csv").write_text("Dossier;Nature\n7389;PL\n", encoding="utf-8")
+    used = []
+    monkeypatch.setattr(data_processing, "convert_duckdb_to_sqlite", lambda duck, sqlite, meta: used.append(meta))
+
+    with pytest.raises(RuntimeError):
+        data_processing.build_database(str(tmp_path), str(tmp_path / "000_duck.db"), str(current),
+                                       source_configs={"121-etat-travaux.csv": {"delimiter": ";"}})
+    assert used == [data_processing.original]
+    assert not data_processing.has_table_metadata(str(current))
+
+    con = sqlite3.connect(current)
+    con.execute("CREATE TABLE table_metadata (tableName TEXT)")
+    con.close()
+    assert data_processing.has_table_metadata(str(current))
+
+
+def test_table_metadata_uses_cleaned_column_names():
+    import sqlite3
+    from data_processing import rename_columns_in_table_metadata
+
+    con = sqlite3.connect(":memory:")
+    rename_columns_in_table_metadata(con)  # No table_metadata: nothing to do
+    con.execute("CREATE TABLE table_metadata (tableName TEXT, columns TEXT, position INTEGER)")
+    con.execute("INSERT INTO table_metadata VALUES ('etat_travaux', '[{\"name\": \"Recev?\"}, {\"name\": \"Etat\"}]', 1)")
+    rename_columns_in_table_metadata(con)
+    assert con.execute("SELECT * FROM table_metadata").fetchone() == (
+        "etat_travaux", '[{"name": "Recev"}, {"name": "Etat"}]', 1,
+    )
@@ -0,0 +1,75 @@
+import csv
+
+import pytest
+
+from data_scaler import SOURCES, read_source, scale_datasets
+
+
+@pytest.fixture
+def raw_folder(tmp_path):
+    folder = tmp_path / "raw"
+    folder.mkdir()
+    with open(folder / "107-presence-seance-publique.csv", "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["LEGISLATURE_NUMBER", "SESSION_NUMBER", "MEETING_DATE", "MEETING_NUMBER",
+                         "MEETING_PRESENCE", "PERSON_TITLE", "NAME", "FIRSTNAME",
+                         "POLITICAL_GROUP", "POLITICAL_PARTY"])
+        for meeting in range(1, 4):
+            for name, firstname, party in [("Adehm", "Diane", "CSV"), ("Agostino", "Barbara", "DP")]:
+                writer.writerow(["18", "134", f"0{meeting}/01/2024 14:30:00", f"Séance publique n° {meeting}",
+                                 "PRESENT", "Madame", name, firstname, party, party])
+    with open(folder / "121-etat-travaux.csv", "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Dossier", "Adresse", "Nature", "Relatif à", "Recev?"])
+        writer.writerow(["7389", "https://www.chd.lu/fr/dossier/7389", "PL", "portant approbation; de l'Accord", ""])
+        writer.writerow(["7390", "https://www.chd.lu/fr/dossier/7390", "PPL", "portant modification", "01.02.19"])
+    return folder
+
+
+def test_scale_datasets_row_counts(raw_folder, tmp_path):
+    written = scale_datasets(raw_folder, tmp_path / "x10", 10)
+    assert written == {"107-presence-seance-publique.csv": 60, "121-etat-travaux.csv": 20}
+
+
+def test_scale_datasets_keeps_format_and_unique_keys(raw_folder, tmp_path):
+    scale_datasets(raw_folder, tmp_path / "x10", 10)
+    header, rows = read_source(tmp_path / "x10" / "121-etat-travaux.csv", SOURCES["121-etat-travaux.csv"]["delimiter"])
+
+    assert header == ["Dossier", "Adresse", "Nature", "Relatif à", "Recev?"]
+    assert len({row[0] for row in rows}) == len(rows)
+    assert all(row[1] == f"https://www.chd.lu/fr/dossier/{row[0]}" for row in rows)
+
+
+def test_scale_datasets_keeps_meetings_and_deputies_consistent(raw_folder, tmp_path):
+    scale_datasets(raw_folder, tmp_path / "x5", 5)
+    header, rows = read_source(tmp_path / "x5" / "107-presence-seance-publique.csv", ",")
+
+    meetings = {}
+    for row in rows:
+        meeting = (row[0], row[1], row[3])
+        meetings.setdefault(meeting, {"dates": set(), "roster": set()})
+        meetings[meeting]["dates"].add(row[2])
+        meetings[meeting]["roster"].add(tuple(row[5:]))
+
+    # 3 meetings per copy, each with a single date, and the same deputies attending
+    # every meeting of a legislature
+    assert len(meetings) == 15
+    assert all(len(m["dates"]) == 1 for m in meetings.values())
+    rosters = {}
+    for (legislature, _, _), m in meetings.items():
+        rosters.setdefault(legislature, set()).add(frozenset(m["roster"]))
+    assert len(rosters) == 5
+    assert all(len(r) == 1 for r in rosters.values())
+
+
+def test_scale_datasets_keeps_deputy_fields_together(raw_folder, tmp_path):
+    _, source_rows = read_source(raw_folder / "107-presence-seance-publique.csv", ",")
+    scale_datasets(raw_folder, tmp_path / "x10", 10)
+    _, rows = read_source(tmp_path / "x10" / "107-presence-seance-publique.csv", ",")
+
+    # Every synthetic deputy is a real one with a suffixed name: no mixed fields
+    source_deputies = {tuple(row[5:]) for row in source_rows}
+    assert {(row[5], row[6].split(" [")[0], *row[7:]) for row in rows} == source_deputies
+    assert {tuple(row[8:]) for row in rows} <= {tuple(row[8:]) for row in source_rows}
+    # and their number grows with the copies
+    assert len({tuple(row[5:]) for row in rows}) == 20
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import db_utils
+
+
+def make_db(path, value):
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE petition (STATUS TEXT)")
+    con.execute("INSERT INTO petition VALUES (?)", (value,))
+    con.commit()
+    con.close()
+
+
+@pytest.fixture
+def db_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_utils, "get_db_path", lambda db_name: str(tmp_path / db_name))
+    monkeypatch.setattr(db_utils, "_generations", {})
+    monkeypatch.setattr(db_utils, "_reload_listeners", [])
+    make_db(tmp_path / "001_sqlite.db", "old")
+    return "001_sqlite.db"
+
+
+def swap_in_new_database(tmp_path, db_name, value):
+    make_db(tmp_path / "new.db", value)
+    os.replace(tmp_path / "new.db", tmp_path / db_name)
+
+
+def test_swapped_database_is_picked_up(tmp_path, db_name):
+    reloads = []
+    db_utils.add_reload_listener(lambda name, generation: reloads.append((name, generation)))
+
+    assert db_utils.fetch_query("SELECT STATUS FROM petition", db_name=db_name)[0][0]["STATUS"] == "old"
+    assert db_utils.get_db_generation(db_name) == 1
+    db_utils.execute_CUD_query("INSERT INTO petition VALUES ('written')", db_name=db_name)
+    assert db_utils.get_db_generation(db_name) == 1  # In-place writes are not a new generation
+
+    swap_in_new_database(tmp_path, db_name, "new")
+    assert db_utils.fetch_query("SELECT STATUS FROM petition", db_name=db_name)[0][0]["STATUS"] == "new"
+    assert db_utils.get_db_generation(db_name) == 2
+    assert reloads == [(db_name, 2)]
+
+
+def test_in_flight_queries_keep_the_old_generation(tmp_path, db_name):
+    with db_utils.db_connection(db_name) as old_conn:
+        swap_in_new_database(tmp_path, db_name, "new")
+        assert db_utils.fetch_query("SELECT STATUS FROM petition", db_name=db_name)[0][0]["STATUS"] == "new"
+        # Still open and reading the replaced file
+        assert old_conn.execute("SELECT STATUS FROM petition").fetchone()["STATUS"] == "old"
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        old_conn.execute("SELECT 1")
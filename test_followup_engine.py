@@ -0,0 +1,40 @@
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+duckdb = pytest.importorskip("duckdb")
+
+from followup_engine import RESULT_TABLE_NAME, clean_generated_sql, describe_result_table, run_follow_up_sql
+
+
+@pytest.fixture
+def previous_result():
+    return pa.table({
+        "NAME": ["Adehm", "Agostino", "Bauler"],
+        "POLITICAL_PARTY": ["CSV", "DP", "CSV"],
+        "presences": [12, 10, 8],
+    })
+
+
+def test_describe_result_table(previous_result):
+    assert describe_result_table(previous_result) == [
+        ("NAME", "string"), ("POLITICAL_PARTY", "string"), ("presences", "int64"),
+    ]
+
+
+def test_clean_generated_sql():
+    assert clean_generated_sql("```sql\nSELECT 1;\n```") == "SELECT 1"
+
+
+def test_run_follow_up_sql(previous_result):
+    df = run_follow_up_sql(
+        f"SELECT NAME FROM {RESULT_TABLE_NAME} WHERE LOWER(POLITICAL_PARTY) = LOWER('csv') ORDER BY presences;",
+        previous_result,
+    )
+    assert list(df["NAME"]) == ["Bauler", "Adehm"]
+
+
+def test_run_follow_up_sql_cannot_reach_other_data(previous_result):
+    with pytest.raises(duckdb.Error):
+        run_follow_up_sql("SELECT * FROM petition", previous_result)
+    with pytest.raises(duckdb.Error):
+        run_follow_up_sql("SELECT * FROM read_csv('raw_datasets/102-petition.csv')", previous_result)
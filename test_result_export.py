@@ -0,0 +1,92 @@
+import io
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("streamlit")
+
+import result_export
+from result_export import ExportError, stream_export, validate_select_sql
+
+
+@pytest.fixture
+def db_name(tmp_path, monkeypatch):
+    path = tmp_path / "001_sqlite.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE presence_seance_publique (NAME TEXT, SESSION_NUMBER INTEGER, MEETING_PRESENCE TEXT)")
+    conn.executemany("INSERT INTO presence_seance_publique VALUES (?, ?, ?)",
+                     [(f"deputy {i}", 134 + i % 3, "PRESENT" if i % 4 else None) for i in range(25)])
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(result_export, "get_db_path", lambda db_name: str(tmp_path / db_name))
+    return "001_sqlite.db"
+
+
+QUERY = "SELECT * FROM presence_seance_publique ORDER BY NAME;"
+
+
+def test_validate_select_sql():
+    assert validate_select_sql("  SELECT 1;  ") == "SELECT 1"
+    assert validate_select_sql("WITH t AS (SELECT ';' AS x) SELECT * FROM t") == "WITH t AS (SELECT ';' AS x) SELECT * FROM t"
+    with pytest.raises(ExportError):
+        validate_select_sql("DELETE FROM petition")
+    with pytest.raises(ExportError):
+        validate_select_sql("SELECT 1; DROP TABLE petition")
+
+
+def test_csv_export_is_streamed_in_batches(db_name):
+    chunks = list(stream_export(QUERY, "csv", batch_rows=10, db_name=db_name))
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert lines[0] == "NAME,SESSION_NUMBER,MEETING_PRESENCE"
+    assert len(lines) == 26
+
+
+@pytest.mark.parametrize("export_format", ["arrow", "parquet"])
+def test_arrow_and_parquet_exports(db_name, export_format):
+    data = b"".join(stream_export(QUERY, export_format, batch_rows=10, db_name=db_name))
+    if export_format == "arrow":
+        table = pa.ipc.open_stream(data).read_all()
+    else:
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 25
+    assert table.column_names == ["NAME", "SESSION_NUMBER", "MEETING_PRESENCE"]
+    assert table.column("MEETING_PRESENCE").null_count == 7
+
+
+def test_empty_result_still_has_header(db_name):
+    data = b"".join(stream_export("SELECT NAME FROM presence_seance_publique WHERE 0", "csv", db_name=db_name))
+    assert data.decode("utf-8").splitlines() == ["NAME"]
+
+
+def test_export_cannot_write(db_name):
+    with pytest.raises(ExportError):
+        list(stream_export("UPDATE presence_seance_publique SET NAME = 'x'", "csv", db_name=db_name))
+
+
+@pytest.mark.parametrize("export_format", ["arrow", "parquet"])
+def test_type_change_across_batches_is_an_error_not_a_truncation(db_name, export_format):
+    sql = "SELECT 1 AS x UNION ALL SELECT 2 UNION ALL SELECT 2.5"
+    with pytest.raises(ExportError):
+        list(stream_export(sql, export_format, batch_rows=2, db_name=db_name))
+
+
+def test_mixed_types_in_first_batch(db_name):
+    data = b"".join(stream_export("SELECT 1 AS x UNION ALL SELECT 2.5", "arrow", db_name=db_name))
+    assert pa.ipc.open_stream(data).read_all().column("x").to_pylist() == [1.0, 2.5]
+    with pytest.raises(ExportError):
+        list(stream_export("SELECT 1 AS x UNION ALL SELECT 'a'", "parquet", db_name=db_name))
+    assert b"".join(stream_export("SELECT 1 AS x UNION ALL SELECT 'a'", "csv", db_name=db_name)) == b"x\r\n1\r\na\r\n"
+
+
+SLOW_QUERY = """
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000)
+    SELECT COUNT(*) FROM n
+"""
+
+
+def test_export_is_stopped_after_its_timeout(db_name):
+    with pytest.raises(ExportError, match="longer than"):
+        list(stream_export(SLOW_QUERY, "csv", db_name=db_name, timeout_s=0.05))
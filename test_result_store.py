@@ -0,0 +1,80 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from result_store import PREVIEW_ROWS, ResultStore, make_history_result
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(max_results_per_session=2, memory_budget_bytes=10**9, spill_dir=str(tmp_path))
+    yield store
+    store.close()
+
+
+def make_table(rows):
+    return pd.DataFrame({"NAME": [f"deputy {i}" for i in range(rows)], "presences": list(range(rows))})
+
+
+def test_history_result_keeps_only_a_preview(store):
+    table = make_table(50)
+    result = make_history_result(store, "session", table)
+
+    assert result["rows"] == 50
+    assert result["columns"] == ["NAME", "presences"]
+    assert len(result["preview"]) == PREVIEW_ROWS
+    pd.testing.assert_frame_equal(store.get(result["id"]), table)
+
+
+def test_session_keeps_most_recent_results(store):
+    ids = [store.put("session", make_table(10)) for _ in range(3)]
+    other = store.put("other", make_table(10))
+
+    assert store.get(ids[0]) is None
+    assert store.get(ids[1]) is not None
+    assert store.get(ids[2]) is not None
+    assert store.get(other) is not None
+
+
+def test_results_spill_to_disk_over_memory_budget(tmp_path):
+    store = ResultStore(memory_budget_bytes=1, spill_dir=str(tmp_path))
+    table = make_table(1000)
+    result_id = store.put("session", table)
+
+    assert store.stats()["memory_bytes"] == 0
+    assert store.stats()["disk_bytes"] > 0
+    pd.testing.assert_frame_equal(store.get(result_id), table)
+
+    store.drop_session("session")
+    assert store.get(result_id) is None
+    assert store.stats()["disk_bytes"] == 0
+
+
+def test_mixed_type_columns_are_stored_as_strings(store):
+    df = pd.DataFrame({"v": [1, "CSV", None], "n": [1, 2, 3]})
+    result = make_history_result(store, "session", df)
+    assert result["id"] is not None
+    stored = store.get(result["id"])
+    assert stored["v"].tolist()[:2] == ["1", "CSV"] and pd.isna(stored["v"].iloc[2])
+    assert stored["n"].tolist() == [1, 2, 3]
+
+
+def test_unstorable_result_keeps_its_preview(store, monkeypatch):
+    def fail(session_id, df):
+        raise MemoryError("no room")
+    monkeypatch.setattr(store, "put", fail)
+    result = make_history_result(store, "session", make_table(10))
+    assert result["id"] is None and result["rows"] == 10 and len(result["preview"]) == PREVIEW_ROWS
+
+
+def test_store_removes_its_own_spill_dir_at_exit(monkeypatch):
+    import atexit
+    import os
+
+    registered = []
+    monkeypatch.setattr(atexit, "register", registered.append)
+    store = ResultStore()
+    assert registered == [store.close] and os.path.isdir(store.spill_dir)
+    registered[0]()
+    assert not os.path.exists(store.spill_dir)
@@ -0,0 +1,31 @@
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+import services
+
+
+def completion_with(response):
+    scheduler = MagicMock()
+    scheduler.submit.return_value = response
+    with patch.object(services, "GEMINI_API_KEY", "key"), patch.object(services, "get_genai"), \
+            patch.object(services, "get_scheduler", return_value=scheduler):
+        return services.get_gemini_completion("prompt", model_name="model")
+
+
+def test_completion_returns_text():
+    assert completion_with(MagicMock(parts=["part"], text="answer")) == "answer"
+
+
+def test_blocked_completion_returns_none():
+    response = MagicMock(parts=[])
+    response.prompt_feedback.block_reason.name = "SAFETY"
+    assert completion_with(response) is None
+
+
+def test_response_errors_return_none():
+    response = MagicMock()
+    type(response).parts = PropertyMock(side_effect=ValueError("no candidates"))
+    assert completion_with(response) is None